@@ -7,6 +7,7 @@ import platform
 import shutil
 import sys
 import webbrowser as wb
+from collections import Counter
 from functools import partial
 
 try:
@@ -43,10 +44,18 @@ from libs.pascal_voc_io import PascalVocReader
 from libs.pascal_voc_io import XML_EXT
 from libs.yolo_io import YoloReader
 from libs.yolo_io import TXT_EXT
-from libs.create_ml_io import CreateMLReader
+from libs.create_ml_io import CreateMLReader, CreateMLStore
 from libs.create_ml_io import JSON_EXT
 from libs.ustr import ustr
 from libs.hashableQListWidgetItem import HashableQListWidgetItem
+from libs.prefetcher import ImagePrefetcher
+from libs.image_cache import ImageCache, file_mtime
+from libs.label_saver import LabelSaver
+from libs.dir_scanner import DirScanner
+from libs.file_list_model import FileListModel
+from libs.annotation_index import AnnotationIndex, split_annotation_base
+from libs.trash_mover import TrashMover, TRASH_DIR_NAME
+from libs.workspace_cache import WorkspaceCache, ImageInfo, WORKSPACE_CACHE_FILE
 
 __appname__ = 'labelImg'
 
@@ -80,6 +89,9 @@ class MainWindow(QMainWindow, WindowMixin):
         # Load setting in the main thread
         self.settings = Settings()
         self.settings.load()
+        # Directory listings and image details from earlier sessions, next to the settings
+        self.workspace_cache = WorkspaceCache(
+            os.path.join(os.path.dirname(self.settings.path), WORKSPACE_CACHE_FILE))
         settings = self.settings
 
         self.os_name = platform.system()
@@ -93,13 +105,32 @@ class MainWindow(QMainWindow, WindowMixin):
         self.label_file_format = settings.get(SETTING_LABEL_FILE_FORMAT, LabelFileFormat.PASCAL_VOC)
 
         # For loading all image under a directory
-        self.m_img_list = []
+        # Which annotation files exist, listed once per directory and watched
+        self.annotation_index = AnnotationIndex(self)
+        self.annotation_index.changed.connect(self.annotations_changed)
+        # Image paths, held compactly by the model of the file list
+        self.file_list_model = FileListModel(self, is_annotated=self.has_annotation_file,
+                                             annotated_icon=new_icon('done'), describe=self.describe_image)
+        self.m_img_list = self.file_list_model.paths
+        self.dir_scanner = None
+        self.trash_mover = None
         self.dir_name = None
         self.label_hist = []
         self.last_open_dir = None
         self.cur_img_idx = 0
         self.img_count = len(self.m_img_list)
 
+        # Decode the images around the current one in the background
+        self.prefetch_ahead = settings.get(SETTING_PREFETCH_AHEAD, 2)
+        self.prefetch_behind = settings.get(SETTING_PREFETCH_BEHIND, 1)
+        self.prefetcher = ImagePrefetcher(self.prefetch_image)
+        # Keep recently viewed images decoded, within a memory budget
+        self.image_cache = ImageCache(settings.get(SETTING_IMAGE_CACHE_BYTES, DEFAULT_IMAGE_CACHE_BYTES))
+        # Annotation files are written behind the UI, in order
+        self.label_saver = LabelSaver(self)
+        self.label_saver.saved.connect(self.label_saved)
+        self.label_saver.failed.connect(self.label_save_failed)
+
         # Whether we need to save or not.
         self.dirty = False
 
@@ -122,6 +153,8 @@ class MainWindow(QMainWindow, WindowMixin):
 
         self.items_to_shapes = {}
         self.shapes_to_items = {}
+        # Number of shapes per label, for the label filter
+        self.label_counts = Counter()
         self.prev_label_text = ''
 
         list_layout = QVBoxLayout()
@@ -171,11 +204,15 @@ class MainWindow(QMainWindow, WindowMixin):
         self.dock.setObjectName(get_str('labels'))
         self.dock.setWidget(label_list_container)
 
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.itemDoubleClicked.connect(self.file_item_double_clicked)
+        self.file_list_view = QListView()
+        self.file_list_view.setUniformItemSizes(True)
+        self.file_list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.file_list_view.setContextMenuPolicy(Qt.ActionsContextMenu)
+        self.file_list_view.setModel(self.file_list_model)
+        self.file_list_view.doubleClicked.connect(self.file_item_double_clicked)
         file_list_layout = QVBoxLayout()
         file_list_layout.setContentsMargins(0, 0, 0, 0)
-        file_list_layout.addWidget(self.file_list_widget)
+        file_list_layout.addWidget(self.file_list_view)
         file_list_container = QWidget()
         file_list_container.setLayout(file_list_layout)
         self.file_dock = QDockWidget(get_str('fileList'), self)
@@ -276,6 +313,10 @@ class MainWindow(QMainWindow, WindowMixin):
 
         delete_image = action(get_str('deleteImg'), self.delete_image, 'Ctrl+Shift+D', 'close', get_str('deleteImgDetail'))
 
+        delete_selected = action(get_str('deleteSelectedImg'), self.delete_selected_images,
+                                 None, 'close', get_str('deleteSelectedImgDetail'))
+        self.file_list_view.addAction(delete_selected)
+
         reset_all = action(get_str('resetAll'), self.reset_all, None, 'resetall', get_str('resetAllDetail'))
 
         color1 = action(get_str('boxLineColor'), self.choose_color1,
@@ -391,7 +432,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.draw_squares_option.triggered.connect(self.toggle_draw_square)
 
         # Store actions for further handling.
-        self.actions = Struct(save=save, save_format=save_format, saveAs=save_as, open=open, close=close, resetAll=reset_all, deleteImg=delete_image,
+        self.actions = Struct(save=save, save_format=save_format, saveAs=save_as, open=open, close=close, resetAll=reset_all, deleteImg=delete_image, deleteSelectedImg=delete_selected,
                               lineColor=color1, create=create, delete=delete, edit=edit, copy=copy,
                               createMode=create_mode, editMode=edit_mode, advancedMode=advanced_mode,
                               shapeLineColor=shape_line_color, shapeFillColor=shape_fill_color,
@@ -438,7 +479,7 @@ class MainWindow(QMainWindow, WindowMixin):
         self.display_label_option.triggered.connect(self.toggle_paint_labels_option)
 
         add_actions(self.menus.file,
-                    (open, open_dir, change_save_dir, open_annotation, copy_prev_bounding, self.menus.recentFiles, save, save_format, save_as, close, reset_all, delete_image, quit))
+                    (open, open_dir, change_save_dir, open_annotation, copy_prev_bounding, self.menus.recentFiles, save, save_format, save_as, close, reset_all, delete_image, delete_selected, quit))
         add_actions(self.menus.help, (help_default, show_info, show_shortcut))
         add_actions(self.menus.view, (
             self.auto_saving,
@@ -657,12 +698,13 @@ class MainWindow(QMainWindow, WindowMixin):
         self.items_to_shapes.clear()
         self.shapes_to_items.clear()
         self.label_list.clear()
+        self.label_counts.clear()
         self.file_path = None
         self.image_data = None
         self.label_file = None
         self.canvas.reset_state()
         self.label_coordinates.clear()
-        self.combo_box.cb.clear()
+        self.combo_box.update_items([])
 
     def current_item(self):
         items = self.label_list.selectedItems()
@@ -776,8 +818,8 @@ class MainWindow(QMainWindow, WindowMixin):
             self.update_combo_box()
 
     # Tzutalin 20160906 : Add file list and dock to move faster
-    def file_item_double_clicked(self, item=None):
-        self.cur_img_idx = self.m_img_list.index(ustr(item.text()))
+    def file_item_double_clicked(self, index=None):
+        self.cur_img_idx = index.row()
         filename = self.m_img_list[self.cur_img_idx]
         if filename:
             self.load_file(filename)
@@ -826,16 +868,28 @@ class MainWindow(QMainWindow, WindowMixin):
         self.actions.shapeFillColor.setEnabled(selected)
 
     def add_label(self, shape):
-        shape.paint_label = self.display_label_option.isChecked()
-        item = HashableQListWidgetItem(shape.label)
-        item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
-        item.setCheckState(Qt.Checked)
-        item.setBackground(generate_color_by_text(shape.label))
-        self.items_to_shapes[item] = shape
-        self.shapes_to_items[shape] = item
-        self.label_list.addItem(item)
-        for action in self.actions.onShapesPresent:
-            action.setEnabled(True)
+        self.add_labels([shape])
+
+    def add_labels(self, shapes):
+        """Add the list items of `shapes` in one go, then update the label filter once."""
+        paint_label = self.display_label_option.isChecked()
+        self.label_list.blockSignals(True)
+        try:
+            for shape in shapes:
+                shape.paint_label = paint_label
+                item = HashableQListWidgetItem(shape.label)
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked)
+                item.setBackground(generate_color_by_text(shape.label))
+                self.items_to_shapes[item] = shape
+                self.shapes_to_items[shape] = item
+                self.label_list.addItem(item)
+        finally:
+            self.label_list.blockSignals(False)
+        self.label_counts.update(shape.label for shape in shapes)
+        if shapes:
+            for action in self.actions.onShapesPresent:
+                action.setEnabled(True)
         self.update_combo_box()
 
     def remove_label(self, shape):
@@ -846,8 +900,14 @@ class MainWindow(QMainWindow, WindowMixin):
         self.label_list.takeItem(self.label_list.row(item))
         del self.shapes_to_items[shape]
         del self.items_to_shapes[item]
+        self.count_label(shape.label, -1)
         self.update_combo_box()
 
+    def count_label(self, label, count):
+        self.label_counts[label] += count
+        if self.label_counts[label] <= 0:
+            del self.label_counts[label]
+
     def load_labels(self, shapes):
         s = []
         for label, points, line_color, fill_color, difficult in shapes:
@@ -874,20 +934,15 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 shape.fill_color = generate_color_by_text(label)
 
-            self.add_label(shape)
-        self.update_combo_box()
+        self.add_labels(s)
         self.canvas.load_shapes(s)
 
     def update_combo_box(self):
-        # Get the unique labels and add them to the Combobox.
-        items_text_list = [str(self.label_list.item(i).text()) for i in range(self.label_list.count())]
-
-        unique_text_list = list(set(items_text_list))
-        # Add a null row for showing all the labels
-        unique_text_list.append("")
-        unique_text_list.sort()
-
-        self.combo_box.update_items(unique_text_list)
+        # The unique labels, after a null row for showing all the labels
+        unique_text_list = [""] + sorted(ustr(label) for label in self.label_counts if label)
+        # Refilling the combo box resets the filter: only do it when the labels changed
+        if unique_text_list != self.combo_box.items:
+            self.combo_box.update_items(unique_text_list)
 
     def save_labels(self, annotation_file_path):
         annotation_file_path = ustr(annotation_file_path)
@@ -904,31 +959,70 @@ class MainWindow(QMainWindow, WindowMixin):
                         difficult=s.difficult)
 
         shapes = [format_shape(shape) for shape in self.canvas.shapes]
+        # The write runs on the saver thread: it gets a snapshot and its own LabelFile
+        label_file = LabelFile()
+        label_file.verified = self.label_file.verified
+        line_color, fill_color = self.line_color.getRgb(), self.fill_color.getRgb()
         # Can add different annotation formats here
-        try:
-            if self.label_file_format == LabelFileFormat.PASCAL_VOC:
-                if annotation_file_path[-4:].lower() != ".xml":
-                    annotation_file_path += XML_EXT
-                self.label_file.save_pascal_voc_format(annotation_file_path, shapes, self.file_path, self.image_data,
-                                                       self.line_color.getRgb(), self.fill_color.getRgb())
-            elif self.label_file_format == LabelFileFormat.YOLO:
-                if annotation_file_path[-4:].lower() != ".txt":
-                    annotation_file_path += TXT_EXT
-                self.label_file.save_yolo_format(annotation_file_path, shapes, self.file_path, self.image_data, self.label_hist,
-                                                 self.line_color.getRgb(), self.fill_color.getRgb())
-            elif self.label_file_format == LabelFileFormat.CREATE_ML:
-                if annotation_file_path[-5:].lower() != ".json":
-                    annotation_file_path += JSON_EXT
-                self.label_file.save_create_ml_format(annotation_file_path, shapes, self.file_path, self.image_data,
-                                                      self.label_hist, self.line_color.getRgb(), self.fill_color.getRgb())
-            else:
-                self.label_file.save(annotation_file_path, shapes, self.file_path, self.image_data,
-                                     self.line_color.getRgb(), self.fill_color.getRgb())
-            print('Image:{0} -> Annotation:{1}'.format(self.file_path, annotation_file_path))
-            return True
-        except LabelFileError as e:
-            self.error_message(u'Error saving label data', u'<b>%s</b>' % e)
-            return False
+        if self.label_file_format == LabelFileFormat.PASCAL_VOC:
+            if annotation_file_path[-4:].lower() != ".xml":
+                annotation_file_path += XML_EXT
+            write = partial(label_file.save_pascal_voc_format, annotation_file_path, shapes, self.file_path,
+                            self.image_data, line_color, fill_color)
+        elif self.label_file_format == LabelFileFormat.YOLO:
+            if annotation_file_path[-4:].lower() != ".txt":
+                annotation_file_path += TXT_EXT
+            # The YOLO writer registers new classes, do it here on a list the UI owns
+            for shape in shapes:
+                if shape['label'] not in self.label_hist:
+                    self.label_hist.append(shape['label'])
+            write = partial(label_file.save_yolo_format, annotation_file_path, shapes, self.file_path,
+                            self.image_data, list(self.label_hist), line_color, fill_color)
+        elif self.label_file_format == LabelFileFormat.CREATE_ML:
+            if annotation_file_path[-5:].lower() != ".json":
+                annotation_file_path += JSON_EXT
+            write = partial(label_file.save_create_ml_format, annotation_file_path, shapes, self.file_path,
+                            self.image_data, list(self.label_hist), line_color, fill_color)
+        else:
+            write = partial(label_file.save, annotation_file_path, shapes, self.file_path, self.image_data,
+                            line_color, fill_color)
+        self.label_saver.submit(self.file_path, annotation_file_path, write)
+        print('Image:{0} -> Annotation:{1}'.format(self.file_path, annotation_file_path))
+        # A prefetched or cached copy of this image would carry the old annotation
+        self.prefetcher.discard(self.file_path)
+        self.image_cache.forget_annotation(self.file_path)
+        self.record_image_info(annotated=True)
+        return True
+
+    def record_image_info(self, annotated=None):
+        """Remember the size and annotation state of the current image for later sessions."""
+        if self.file_path is None or self.image.isNull():
+            return
+        if annotated is None:
+            annotated = self.has_annotation_file(self.file_path)
+        self.workspace_cache.save_image_info(self.file_path, ImageInfo(
+            self.image.width(), self.image.height(), annotated, self.canvas.verified, len(self.canvas.shapes)))
+
+    def describe_image(self, file_path):
+        info = self.workspace_cache.image_info(file_path)
+        if info is None:
+            return file_path
+        return u'%s\n%d x %d, %d boxes%s' % (file_path, info.width, info.height, info.boxes,
+                                             ', verified' if info.verified else '')
+
+    def label_saved(self, image_path, annotation_path):
+        # Prefetched while the write was queued, these copies may hold the old annotation
+        self.prefetcher.discard(image_path)
+        self.image_cache.forget_annotation(image_path)
+        if annotation_path:
+            self.annotation_index.update_file(annotation_path)
+            self.file_list_model.refresh_decorations()
+
+    def label_save_failed(self, image_path, annotation_path, error):
+        self.label_saved(image_path, annotation_path)
+        if image_path == self.file_path:
+            self.set_dirty()
+        self.status(u'Error saving label data to %s: %s' % (annotation_path, error), delay=0)
 
     def copy_selected_shape(self):
         self.add_label(self.canvas.copy_selected_shape())
@@ -961,6 +1055,8 @@ class MainWindow(QMainWindow, WindowMixin):
         shape = self.items_to_shapes[item]
         label = item.text()
         if label != shape.label:
+            self.count_label(shape.label, -1)
+            self.count_label(label, 1)
             shape.label = item.text()
             shape.line_color = generate_color_by_text(shape.label)
             self.set_dirty()
@@ -1120,16 +1216,19 @@ class MainWindow(QMainWindow, WindowMixin):
         unicode_file_path = os.path.abspath(unicode_file_path)
         # Tzutalin 20160906 : Add file list and dock to move faster
         # Highlight the file item
-        if unicode_file_path and self.file_list_widget.count() > 0:
+        if unicode_file_path and len(self.m_img_list) > 0:
             if unicode_file_path in self.m_img_list:
                 index = self.m_img_list.index(unicode_file_path)
-                file_widget_item = self.file_list_widget.item(index)
-                file_widget_item.setSelected(True)
+                self.file_list_view.setCurrentIndex(self.file_list_model.index(index))
             else:
-                self.file_list_widget.clear()
-                self.m_img_list.clear()
+                self.stop_dir_scan()
+                self.file_list_model.clear()
 
         if unicode_file_path and os.path.exists(unicode_file_path):
+            # Read the annotation only once its queued writes have landed
+            if self.label_saver.flush(unicode_file_path):
+                self.label_saved(unicode_file_path, None)
+            cached = None
             if LabelFile.is_label_file(unicode_file_path):
                 try:
                     self.label_file = LabelFile(unicode_file_path)
@@ -1148,7 +1247,18 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 # Load image:
                 # read data first and store for saving into label file.
-                self.image_data = read(unicode_file_path, None)
+                cached = self.image_cache.get(unicode_file_path)
+                if cached is None:
+                    prefetched = self.prefetcher.take(unicode_file_path)
+                    if prefetched is not None:
+                        cached = self.image_cache.put(unicode_file_path, prefetched.mtime,
+                                                      prefetched.image, annotation=prefetched.annotation)
+                if cached is not None:
+                    self.image_data = cached.image
+                else:
+                    mtime = file_mtime(unicode_file_path)
+                    self.image_data = read(unicode_file_path, None)
+                    cached = self.image_cache.put(unicode_file_path, mtime, self.image_data)
                 self.label_file = None
                 self.canvas.verified = False
 
@@ -1164,7 +1274,12 @@ class MainWindow(QMainWindow, WindowMixin):
             self.status("Loaded %s" % os.path.basename(unicode_file_path))
             self.image = image
             self.file_path = unicode_file_path
-            self.canvas.load_pixmap(QPixmap.fromImage(image))
+            if cached is not None and cached.pixmap is not None:
+                self.canvas.load_pixmap(cached.pixmap)
+            else:
+                self.canvas.load_pixmap(QPixmap.fromImage(image))
+                if cached is not None:
+                    self.image_cache.attach_pixmap(unicode_file_path, self.canvas.pixmap)
             if self.label_file:
                 self.load_labels(self.label_file.shapes)
             self.set_clean()
@@ -1173,7 +1288,16 @@ class MainWindow(QMainWindow, WindowMixin):
             self.paint_canvas()
             self.add_recent_file(self.file_path)
             self.toggle_actions(True)
-            self.show_bounding_box_from_annotation_file(self.file_path)
+            if cached is not None and cached.annotation is not None:
+                annotation_path, reader = cached.annotation
+                if annotation_path is not None:
+                    self.load_annotation_file(annotation_path, self.file_path, reader)
+            else:
+                annotation = self.show_bounding_box_from_annotation_file(self.file_path)
+                if cached is not None:
+                    cached.annotation = annotation
+            self.record_image_info()
+            self.prefetch_neighbours()
 
             counter = self.counter_str()
             self.setWindowTitle(__appname__ + ' ' + file_path + ' ' + counter)
@@ -1193,35 +1317,79 @@ class MainWindow(QMainWindow, WindowMixin):
         """
         return '[{} / {}]'.format(self.cur_img_idx + 1, self.img_count)
 
-    def show_bounding_box_from_annotation_file(self, file_path):
+    def annotation_base(self, file_path):
+        """Path of the annotation files of `file_path`, without extension."""
         if self.default_save_dir is not None:
             basename = os.path.basename(os.path.splitext(file_path)[0])
-            xml_path = os.path.join(self.default_save_dir, basename + XML_EXT)
-            txt_path = os.path.join(self.default_save_dir, basename + TXT_EXT)
-            json_path = os.path.join(self.default_save_dir, basename + JSON_EXT)
+            return os.path.join(self.default_save_dir, basename)
+        return os.path.splitext(file_path)[0]
 
-            """Annotation file priority:
-            PascalXML > YOLO
-            """
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
+    def find_annotation_file(self, file_path):
+        """Annotation file priority:
+        PascalXML > YOLO > CreateML
+        """
+        return self.annotation_index.find(self.annotation_base(file_path))
+
+    def has_annotation_file(self, file_path):
+        return bool(self.annotation_index.formats(self.annotation_base(file_path)))
+
+    def annotations_changed(self, folder, stems):
+        """Annotation files were changed on disk, drop what was read from them."""
+        stems = set(stems)
+        for path in list(self.image_cache.entries) + list(self.prefetcher.futures):
+            path_folder, stem = split_annotation_base(self.annotation_base(path))
+            if path_folder == folder and stem in stems:
+                self.prefetcher.discard(path)
+                self.image_cache.forget_annotation(path)
+        self.file_list_model.refresh_decorations()
+
+    def read_annotation_file(self, annotation_path, file_path, image):
+        if annotation_path.endswith(XML_EXT):
+            return PascalVocReader(annotation_path)
+        elif annotation_path.endswith(TXT_EXT):
+            return YoloReader(annotation_path, image, self.default_prefdef_class_file)
+        return CreateMLReader(annotation_path, file_path)
+
+    def load_annotation_file(self, annotation_path, file_path, reader=None):
+        if annotation_path.endswith(XML_EXT):
+            return self.load_pascal_xml_by_filename(annotation_path, reader)
+        elif annotation_path.endswith(TXT_EXT):
+            return self.load_yolo_txt_by_filename(annotation_path, reader)
+        elif annotation_path.endswith(JSON_EXT):
+            return self.load_create_ml_json_by_filename(annotation_path, file_path, reader)
 
-        else:
-            xml_path = os.path.splitext(file_path)[0] + XML_EXT
-            txt_path = os.path.splitext(file_path)[0] + TXT_EXT
-            json_path = os.path.splitext(file_path)[0] + JSON_EXT
-
-            if os.path.isfile(xml_path):
-                self.load_pascal_xml_by_filename(xml_path)
-            elif os.path.isfile(txt_path):
-                self.load_yolo_txt_by_filename(txt_path)
-            elif os.path.isfile(json_path):
-                self.load_create_ml_json_by_filename(json_path, file_path)
-            
+    def show_bounding_box_from_annotation_file(self, file_path):
+        """Load the annotation of `file_path` and return (annotation_path, reader)."""
+        annotation_path = self.find_annotation_file(file_path)
+        if annotation_path is None:
+            return None, None
+        return annotation_path, self.load_annotation_file(annotation_path, file_path)
+
+    def prefetch_image(self, file_path):
+        """Runs on a prefetch worker: decode the image and parse its annotation file."""
+        mtime = file_mtime(file_path)
+        image = read(file_path, None)
+        annotation_path = self.find_annotation_file(file_path)
+        annotation = annotation_path, None
+        if annotation_path is not None and isinstance(image, QImage):
+            try:
+                annotation = annotation_path, self.read_annotation_file(annotation_path, file_path, image)
+            except Exception:
+                # Leave it to load_file, which reports the error on the UI thread
+                annotation = None
+        return Struct(mtime=mtime, image=image, annotation=annotation)
+
+    def prefetch_neighbours(self):
+        """Queue the next and previous images of the list for decoding."""
+        idx = self.cur_img_idx
+        if not 0 <= idx < len(self.m_img_list) or self.m_img_list[idx] != self.file_path:
+            self.prefetcher.clear()
+            return
+        for path, prefetched in self.prefetcher.collect():
+            self.image_cache.put(path, prefetched.mtime, prefetched.image, annotation=prefetched.annotation)
+        ahead = self.m_img_list[idx + 1:idx + 1 + self.prefetch_ahead]
+        behind = self.m_img_list[max(0, idx - self.prefetch_behind):idx]
+        self.prefetcher.prefetch([path for path in ahead + behind[::-1] if path not in self.image_cache])
 
     def resizeEvent(self, event):
         if self.canvas and not self.image.isNull()\
@@ -1291,6 +1459,14 @@ class MainWindow(QMainWindow, WindowMixin):
         settings[SETTING_DRAW_SQUARE] = self.draw_squares_option.isChecked()
         settings[SETTING_LABEL_FILE_FORMAT] = self.label_file_format
         settings.save()
+        if event.isAccepted():
+            self.stop_dir_scan()
+            if self.trash_mover is not None:
+                self.trash_mover.wait()
+            self.prefetcher.shutdown()
+            self.label_saver.shutdown()
+            CreateMLStore.close_all()
+            self.workspace_cache.close()
 
     def load_recent(self, filename):
         if self.may_continue():
@@ -1321,6 +1497,9 @@ class MainWindow(QMainWindow, WindowMixin):
 
         if dir_path is not None and len(dir_path) > 1:
             self.default_save_dir = dir_path
+            self.prefetcher.clear()
+            self.image_cache.forget_annotations()
+            self.file_list_model.refresh_decorations()
 
         self.show_bounding_box_from_annotation_file(self.file_path)
 
@@ -1330,6 +1509,7 @@ class MainWindow(QMainWindow, WindowMixin):
 
 
     def open_annotation_dialog(self, _value=False):
+        self.label_saver.flush()
         if self.file_path is None:
             self.statusBar().showMessage('Please select image first')
             self.statusBar().show()
@@ -1384,13 +1564,60 @@ class MainWindow(QMainWindow, WindowMixin):
         self.last_open_dir = dir_path
         self.dir_name = dir_path
         self.file_path = None
-        self.file_list_widget.clear()
-        self.m_img_list = self.scan_all_images(dir_path)
+        self.file_list_model.clear()
+        self.img_count = 0
+        self.cur_img_idx = 0
+        # Images are listed on a worker thread and added to the list as they are found
+        self.stop_dir_scan()
+        extensions = ['.%s' % fmt.data().decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()]
+        listed_dirs, listed_paths = self.workspace_cache.load_scan(os.path.abspath(dir_path))
+        self.dir_scanner = DirScanner(dir_path, extensions, skip_dirs=[TRASH_DIR_NAME],
+                                      listed_dirs=listed_dirs, listed_paths=listed_paths, parent=self)
+        self.dir_scanner.found.connect(self.add_scanned_images)
+        self.dir_scanner.restored.connect(self.restore_scanned_images)
+        self.dir_scanner.finished.connect(self.dir_scan_finished)
+        self.dir_scanner.start()
+
+    def add_scanned_images(self, paths, keys):
+        if self.sender() is not self.dir_scanner:
+            return
+        tracking = 0 <= self.cur_img_idx < len(self.m_img_list) and \
+            self.m_img_list[self.cur_img_idx] == self.file_path
+        rows = self.file_list_model.merge(paths, keys)
+        self.img_count = len(self.m_img_list)
+        if tracking:
+            for row in rows:
+                if row <= self.cur_img_idx:
+                    self.cur_img_idx += 1
+        if tracking:
+            self.setWindowTitle(__appname__ + ' ' + self.file_path + ' ' + self.counter_str())
+        elif self.file_path is None and self.img_count == len(paths):
+            # Show the first image found without waiting for the rest
+            self.open_next_image()
+
+    def restore_scanned_images(self, paths):
+        """Nothing changed since the last scan of the directory: show its list as it was."""
+        if self.sender() is not self.dir_scanner:
+            return
+        self.file_list_model.extend(paths)
         self.img_count = len(self.m_img_list)
-        self.open_next_image()
-        for imgPath in self.m_img_list:
-            item = QListWidgetItem(imgPath)
-            self.file_list_widget.addItem(item)
+        if self.file_path is None:
+            self.open_next_image()
+
+    def dir_scan_finished(self):
+        scanner = self.sender()
+        if scanner is self.dir_scanner:
+            # The list is complete, its sort keys are not needed anymore
+            self.m_img_list.drop_keys()
+            if scanner.complete:
+                self.workspace_cache.save_scan(scanner.dir_path, scanner.listed, list(self.m_img_list))
+
+    def stop_dir_scan(self):
+        if self.dir_scanner is not None:
+            self.dir_scanner.cancel()
+            self.dir_scanner.wait()
+            self.dir_scanner.deleteLater()
+            self.dir_scanner = None
 
     def verify_image(self, _value=False):
         # Proceeding next image without dialog if having any label
@@ -1538,7 +1765,13 @@ class MainWindow(QMainWindow, WindowMixin):
             idx = self.cur_img_idx
             if os.path.exists(delete_path):
                 os.remove(delete_path)
-            self.import_dir_images(self.last_open_dir)
+            if not 0 <= idx < len(self.m_img_list) or self.m_img_list[idx] != delete_path:
+                self.import_dir_images(self.last_open_dir)
+                return
+            # Drop the image from the list instead of scanning the directory again
+            self.forget_image(delete_path)
+            self.file_list_model.remove(idx)
+            self.img_count = len(self.m_img_list)
             if self.img_count > 0:
                 self.cur_img_idx = min(idx, self.img_count - 1)
                 filename = self.m_img_list[self.cur_img_idx]
@@ -1546,6 +1779,56 @@ class MainWindow(QMainWindow, WindowMixin):
             else:
                 self.close_file()
 
+    def delete_selected_images(self, _value=False):
+        """Move the images selected in the file list to the trash directory, in the background."""
+        rows = sorted(index.row() for index in self.file_list_view.selectionModel().selectedRows())
+        if not rows or not self.last_open_dir:
+            return
+        if self.trash_mover is not None:
+            self.trash_mover.wait()
+        paths = [self.m_img_list[row] for row in rows]
+        self.trash_mover = TrashMover(self.last_open_dir, paths, parent=self)
+        self.trash_mover.moved.connect(self.images_trashed)
+        self.trash_mover.finished.connect(self.trash_mover.deleteLater)
+        self.trash_mover.start()
+        self.status('Moving %d images to %s' % (len(paths), self.trash_mover.trash_dir))
+
+    def images_trashed(self, paths, errors):
+        if self.sender() is self.trash_mover:
+            self.trash_mover = None
+        rows = []
+        for path in paths:
+            self.forget_image(path)
+            try:
+                rows.append(self.m_img_list.index(path))
+            except ValueError:
+                pass
+        tracking = 0 <= self.cur_img_idx < len(self.m_img_list) and \
+            self.m_img_list[self.cur_img_idx] == self.file_path
+        self.file_list_model.remove_rows(rows)
+        self.img_count = len(self.m_img_list)
+        if tracking:
+            current_removed = self.cur_img_idx in rows
+            self.cur_img_idx -= sum(1 for row in rows if row < self.cur_img_idx)
+            if current_removed:
+                # Its file is gone, there is nothing left to save
+                self.set_clean()
+                if self.img_count > 0:
+                    self.cur_img_idx = min(self.cur_img_idx, self.img_count - 1)
+                    self.load_file(self.m_img_list[self.cur_img_idx])
+                else:
+                    self.close_file()
+            else:
+                self.setWindowTitle(__appname__ + ' ' + self.file_path + ' ' + self.counter_str())
+        if errors:
+            self.error_message(u'Error moving images to the trash', '<br/>'.join(errors))
+        else:
+            self.status('Moved %d images to the trash' % len(paths))
+
+    def forget_image(self, path):
+        self.prefetcher.discard(path)
+        self.image_cache.discard(path)
+
     def reset_all(self):
         self.settings.reset()
         self.close()
@@ -1635,44 +1918,50 @@ class MainWindow(QMainWindow, WindowMixin):
                     else:
                         self.label_hist.append(line)
 
-    def load_pascal_xml_by_filename(self, xml_path):
+    def load_pascal_xml_by_filename(self, xml_path, t_voc_parse_reader=None):
         if self.file_path is None:
             return
-        if os.path.isfile(xml_path) is False:
+        if t_voc_parse_reader is None and not self.annotation_index.has_file(xml_path):
             return
 
         self.set_format(FORMAT_PASCALVOC)
 
-        t_voc_parse_reader = PascalVocReader(xml_path)
+        if t_voc_parse_reader is None:
+            t_voc_parse_reader = PascalVocReader(xml_path)
         shapes = t_voc_parse_reader.get_shapes()
         self.load_labels(shapes)
         self.canvas.verified = t_voc_parse_reader.verified
+        return t_voc_parse_reader
 
-    def load_yolo_txt_by_filename(self, txt_path):
+    def load_yolo_txt_by_filename(self, txt_path, t_yolo_parse_reader=None):
         if self.file_path is None:
             return
-        if os.path.isfile(txt_path) is False:
+        if t_yolo_parse_reader is None and not self.annotation_index.has_file(txt_path):
             return
 
         self.set_format(FORMAT_YOLO)
-        t_yolo_parse_reader = YoloReader(txt_path, self.image, self.default_prefdef_class_file)
+        if t_yolo_parse_reader is None:
+            t_yolo_parse_reader = YoloReader(txt_path, self.image, self.default_prefdef_class_file)
         shapes = t_yolo_parse_reader.get_shapes()
         # print(shapes)
         self.load_labels(shapes)
         self.canvas.verified = t_yolo_parse_reader.verified
+        return t_yolo_parse_reader
 
-    def load_create_ml_json_by_filename(self, json_path, file_path):
+    def load_create_ml_json_by_filename(self, json_path, file_path, create_ml_parse_reader=None):
         if self.file_path is None:
             return
-        if os.path.isfile(json_path) is False:
+        if create_ml_parse_reader is None and not self.annotation_index.has_file(json_path):
             return
 
         self.set_format(FORMAT_CREATEML)
 
-        create_ml_parse_reader = CreateMLReader(json_path, file_path)
+        if create_ml_parse_reader is None:
+            create_ml_parse_reader = CreateMLReader(json_path, file_path)
         shapes = create_ml_parse_reader.get_shapes()
         self.load_labels(shapes)
         self.canvas.verified = create_ml_parse_reader.verified
+        return create_ml_parse_reader
 
     def copy_previous_bounding_boxes(self):
         current_index = self.m_img_list.index(self.file_path)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import threading
+
+try:
+    from PyQt5.QtCore import QObject, QFileSystemWatcher, Qt, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QObject, QFileSystemWatcher, Qt, pyqtSignal
+
+from libs.create_ml_io import JSON_EXT
+from libs.pascal_voc_io import XML_EXT
+from libs.yolo_io import TXT_EXT
+
+# Annotation file priority: PascalXML > YOLO > CreateML
+ANNOTATION_EXTS = (XML_EXT, TXT_EXT, JSON_EXT)
+
+
+def split_annotation_base(annotation_base):
+    folder, stem = os.path.split(annotation_base)
+    return os.path.normcase(os.path.abspath(folder)), os.path.normcase(stem)
+
+
+class AnnotationIndex(QObject):
+    """
+        Which annotation files exist, per directory.
+        A directory is listed with a single scandir the first time one of its
+        annotations is looked up, then kept up to date by a QFileSystemWatcher.
+        For every file name without extension it records the annotation
+        extensions found with their mtimes. Lookups may come from any thread.
+    """
+    # Directory, and the names (without extension) whose annotations changed
+    changed = pyqtSignal(str, list)
+    scanned = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super(AnnotationIndex, self).__init__(parent)
+        self.lock = threading.RLock()
+        # folder -> {stem: {ext: mtime}}
+        self.folders = {}
+        # folder -> its mtime when it was listed
+        self.folder_mtimes = {}
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.rescan)
+        # Watches are added on the thread owning the index, once the lookup is done
+        self.scanned.connect(self.watch, Qt.QueuedConnection)
+
+    @staticmethod
+    def folder_mtime(folder):
+        try:
+            return os.stat(folder).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def list_folder(folder):
+        entries = {}
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    stem, ext = os.path.splitext(entry.name)
+                    ext = os.path.normcase(ext)
+                    if ext not in ANNOTATION_EXTS:
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        mtime = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+                    entries.setdefault(os.path.normcase(stem), {})[ext] = mtime
+        except OSError:
+            pass
+        return entries
+
+    def folder_entries(self, folder):
+        with self.lock:
+            entries = self.folders.get(folder)
+            if entries is None:
+                self.folder_mtimes[folder] = self.folder_mtime(folder)
+                entries = self.folders[folder] = self.list_folder(folder)
+                self.scanned.emit(folder)
+            return entries
+
+    def formats(self, annotation_base):
+        """Return {ext: mtime} of the annotation files named `annotation_base` + ext."""
+        folder, stem = split_annotation_base(annotation_base)
+        return self.folder_entries(folder).get(stem, {})
+
+    def find(self, annotation_base):
+        """Return the path of the annotation file for `annotation_base`, by priority, or None."""
+        formats = self.formats(annotation_base)
+        for ext in ANNOTATION_EXTS:
+            if ext in formats:
+                return annotation_base + ext
+        return None
+
+    def has_file(self, annotation_path):
+        if not annotation_path:
+            return False
+        annotation_base, ext = os.path.splitext(annotation_path)
+        return os.path.normcase(ext) in self.formats(annotation_base)
+
+    def update_file(self, annotation_path):
+        """Record a file this process just wrote or removed, without waiting for the watcher."""
+        annotation_base, ext = os.path.splitext(annotation_path)
+        ext = os.path.normcase(ext)
+        if ext not in ANNOTATION_EXTS:
+            return
+        folder, stem = split_annotation_base(annotation_base)
+        try:
+            mtime = os.stat(annotation_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self.lock:
+            entries = self.folders.get(folder)
+            if entries is None:
+                return
+            formats = entries.setdefault(stem, {})
+            if mtime is None:
+                formats.pop(ext, None)
+                if not formats:
+                    del entries[stem]
+            else:
+                formats[ext] = mtime
+
+    def watch(self, folder):
+        with self.lock:
+            if folder not in self.folders:
+                return
+            listed_mtime = self.folder_mtimes.get(folder)
+        self.watcher.addPath(folder)
+        # Catch what changed between the listing and the watch
+        if listed_mtime is None or self.folder_mtime(folder) != listed_mtime:
+            self.rescan(folder)
+
+    def rescan(self, folder):
+        mtime = self.folder_mtime(folder)
+        entries = self.list_folder(folder)
+        with self.lock:
+            old = self.folders.get(folder)
+            if old is None:
+                return
+            self.folders[folder] = entries
+            self.folder_mtimes[folder] = mtime
+        stems = [stem for stem in set(old) | set(entries) if old.get(stem) != entries.get(stem)]
+        if stems:
+            self.changed.emit(folder, stems)
+
+    def clear(self):
+        with self.lock:
+            self.folders.clear()
+            self.folder_mtimes.clear()
+        folders = self.watcher.directories()
+        if folders:
+            self.watcher.removePaths(folders)
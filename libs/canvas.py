@@ -10,6 +10,7 @@ except ImportError:
 # from PyQt4.QtOpenGL import *
 
 from libs.shape import Shape
+from libs.shape_index import ShapeGrid
 from libs.utils import distance
 
 CURSOR_DEFAULT = Qt.ArrowCursor
@@ -33,12 +34,16 @@ class Canvas(QWidget):
     CREATE, EDIT = list(range(2))
 
     epsilon = 24.0
+    # The hover grid has about this many cells along the longest image side
+    grid_cells = 32
 
     def __init__(self, *args, **kwargs):
         super(Canvas, self).__init__(*args, **kwargs)
         # Initialise local state.
         self.mode = self.EDIT
         self.shapes = []
+        # Spatial index of self.shapes: a point can only hit the shapes of its cell
+        self.shape_index = ShapeGrid(margin=self.epsilon)
         self.current = None
         self.selected_shape = None  # save the selected shape here
         self.selected_shape_copy = None
@@ -49,6 +54,9 @@ class Canvas(QWidget):
         self.offsets = QPointF(), QPointF()
         self.scale = 1.0
         self.overlay_color = None
+        # Brightness overlay of the pixmap, with the (pixmap, color) key it was made for
+        self._overlay_key = None
+        self._overlay_pixmap = None
         self.label_font_size = 16
         self.pixmap = QPixmap()
         self.visible = {}
@@ -98,7 +106,7 @@ class Canvas(QWidget):
             self.un_highlight()
             self.de_select_shape()
         self.prev_point = QPointF()
-        self.repaint()
+        self.update()
 
     def un_highlight(self, shape=None):
         if shape == None or shape == self.h_shape:
@@ -122,6 +130,7 @@ class Canvas(QWidget):
         # Polygon drawing.
         if self.drawing():
             self.override_cursor(CURSOR_DRAW)
+            dirty = self.drawing_rects()
             if self.current:
                 # Display annotation width and height while drawing
                 current_width = abs(self.current[0].x() - pos.x())
@@ -162,26 +171,28 @@ class Canvas(QWidget):
                 self.current.highlight_clear()
             else:
                 self.prev_point = pos
-            self.repaint()
+            self.update_image_rects(dirty + self.drawing_rects())
             return
 
         # Polygon copy moving.
         if Qt.RightButton & ev.buttons():
             if self.selected_shape_copy and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
+                dirty = self.selected_shape_copy.paint_rect()
                 self.bounded_move_shape(self.selected_shape_copy, pos)
-                self.repaint()
+                self.update_image_rects([dirty, self.selected_shape_copy.paint_rect()])
             elif self.selected_shape:
                 self.selected_shape_copy = self.selected_shape.copy()
-                self.repaint()
+                self.update_image_rects([self.selected_shape_copy.paint_rect()])
             return
 
         # Polygon/Vertex moving.
         if Qt.LeftButton & ev.buttons():
             if self.selected_vertex():
+                dirty = self.h_shape.paint_rect()
                 self.bounded_move_vertex(pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update_image_rects([dirty, self.h_shape.paint_rect()])
 
                 # Display annotation width and height while moving vertex
                 point1 = self.h_shape[1]
@@ -192,9 +203,10 @@ class Canvas(QWidget):
                         'Width: %d, Height: %d / X: %d; Y: %d' % (current_width, current_height, pos.x(), pos.y()))
             elif self.selected_shape and self.prev_point:
                 self.override_cursor(CURSOR_MOVE)
+                dirty = self.selected_shape.paint_rect()
                 self.bounded_move_shape(self.selected_shape, pos)
                 self.shapeMoved.emit()
-                self.repaint()
+                self.update_image_rects([dirty, self.selected_shape.paint_rect()])
 
                 # Display annotation width and height while moving shape
                 point1 = self.selected_shape[1]
@@ -216,7 +228,8 @@ class Canvas(QWidget):
         # - Highlight vertex
         # Update shape/vertex fill and tooltip value accordingly.
         self.setToolTip("Image")
-        priority_list = self.shapes + ([self.selected_shape] if self.selected_shape else [])
+        highlighted = self.h_shape, self.h_vertex
+        priority_list = self.shape_index.candidates(pos) + ([self.selected_shape] if self.selected_shape else [])
         for shape in reversed([s for s in priority_list if self.isVisible(s)]):
             # Look for a nearby vertex to highlight. If that fails,
             # check if we happen to be inside a shape.
@@ -229,7 +242,6 @@ class Canvas(QWidget):
                 self.override_cursor(CURSOR_POINT)
                 self.setToolTip("Click & drag to move point")
                 self.setStatusTip(self.toolTip())
-                self.update()
                 break
             elif shape.contains_point(pos):
                 if self.selected_vertex():
@@ -239,7 +251,6 @@ class Canvas(QWidget):
                     "Click & drag to move shape '%s'" % shape.label)
                 self.setStatusTip(self.toolTip())
                 self.override_cursor(CURSOR_GRAB)
-                self.update()
 
                 # Display annotation width and height while hovering inside
                 point1 = self.h_shape[1]
@@ -252,9 +263,12 @@ class Canvas(QWidget):
         else:  # Nothing found, clear highlights, reset state.
             if self.h_shape:
                 self.h_shape.highlight_clear()
-                self.update()
             self.h_vertex, self.h_shape = None, None
             self.override_cursor(CURSOR_DEFAULT)
+        if (self.h_shape, self.h_vertex) != highlighted:
+            # Only the shapes whose highlight or fill changed need painting
+            self.update_image_rects([shape.paint_rect() for shape in set([highlighted[0], self.h_shape])
+                                     if shape is not None and shape.points])
 
     def mousePressEvent(self, ev):
         pos = self.transform_pos(ev.pos())
@@ -284,7 +298,7 @@ class Canvas(QWidget):
                and self.selected_shape_copy:
                 # Cancel the move by deleting the shadow copy.
                 self.selected_shape_copy = None
-                self.repaint()
+                self.update()
         elif ev.button() == Qt.LeftButton and self.selected_shape:
             if self.selected_vertex():
                 self.override_cursor(CURSOR_POINT)
@@ -305,11 +319,13 @@ class Canvas(QWidget):
         # del shape.line_color
         if copy:
             self.shapes.append(shape)
+            self.shape_index.add(shape)
             self.selected_shape.selected = False
             self.selected_shape = shape
-            self.repaint()
+            self.update()
         else:
             self.selected_shape.points = [p for p in shape.points]
+            self.shape_index.update(self.selected_shape)
         self.selected_shape_copy = None
 
     def hide_background_shapes(self, value):
@@ -318,7 +334,7 @@ class Canvas(QWidget):
             # Only hide other shapes if there is a current selection.
             # Otherwise the user will not be able to select a shape.
             self.set_hiding(True)
-            self.repaint()
+            self.update()
 
     def handle_drawing(self, pos):
         if self.current and self.current.reach_max_points() is False:
@@ -369,7 +385,7 @@ class Canvas(QWidget):
             shape.highlight_vertex(index, shape.MOVE_VERTEX)
             self.select_shape(shape)
             return self.h_vertex
-        for shape in reversed(self.shapes):
+        for shape in reversed(self.shape_index.candidates(point)):
             if self.isVisible(shape) and shape.contains_point(point):
                 self.select_shape(shape)
                 self.calculate_offsets(shape, point)
@@ -433,6 +449,7 @@ class Canvas(QWidget):
             right_shift = QPointF(0, shift_pos.y())
         shape.move_vertex_by(right_index, right_shift)
         shape.move_vertex_by(left_index, left_shift)
+        self.shape_index.update(shape)
 
     def bounded_move_shape(self, shape, pos):
         if self.out_of_pixmap(pos):
@@ -452,6 +469,7 @@ class Canvas(QWidget):
         dp = pos - self.prev_point
         if dp:
             shape.move_by(dp)
+            self.shape_index.update(shape)
             self.prev_point = pos
             return True
         return False
@@ -469,6 +487,7 @@ class Canvas(QWidget):
             shape = self.selected_shape
             self.un_highlight(shape)
             self.shapes.remove(self.selected_shape)
+            self.shape_index.remove(shape)
             self.selected_shape = None
             self.update()
             return shape
@@ -478,6 +497,7 @@ class Canvas(QWidget):
             shape = self.selected_shape.copy()
             self.de_select_shape()
             self.shapes.append(shape)
+            self.shape_index.add(shape)
             shape.selected = True
             self.selected_shape = shape
             self.bounded_shift_shape(shape)
@@ -506,19 +526,15 @@ class Canvas(QWidget):
         p.scale(self.scale, self.scale)
         p.translate(self.offset_to_center())
 
-        temp = self.pixmap
-        if self.overlay_color:
-            temp = QPixmap(self.pixmap)
-            painter = QPainter(temp)
-            painter.setCompositionMode(painter.CompositionMode_Overlay)
-            painter.fillRect(temp.rect(), self.overlay_color)
-            painter.end()
-
-        p.drawPixmap(0, 0, temp)
+        # Only the part of the image in the area being painted
+        clip = self.image_rect(event.rect())
+        source = QRectF(clip.adjusted(-2, -2, 2, 2).toAlignedRect() & self.pixmap.rect())
+        p.drawPixmap(source, self.overlaid_pixmap(), source)
         Shape.scale = self.scale
         Shape.label_font_size = self.label_font_size
         for shape in self.shapes:
-            if (shape.selected or not self._hide_background) and self.isVisible(shape):
+            if (shape.selected or not self._hide_background) and self.isVisible(shape) and \
+                    shape.paint_rect().intersects(clip):
                 shape.fill = shape.selected or shape == self.h_shape
                 if self.highlight_polygons:
                     shape.fill = True
@@ -561,6 +577,38 @@ class Canvas(QWidget):
         """Convert from widget-logical coordinates to painter-logical coordinates."""
         return point / self.scale - self.offset_to_center()
 
+    def image_rect(self, rect):
+        """Image area shown in the widget area `rect`."""
+        offset = self.offset_to_center()
+        return QRectF(rect.x() / self.scale - offset.x(), rect.y() / self.scale - offset.y(),
+                      rect.width() / self.scale, rect.height() / self.scale)
+
+    def widget_rect(self, rect):
+        """Widget area showing the image area `rect`, with a pixel of margin for antialiasing."""
+        offset = self.offset_to_center()
+        return QRectF((rect.x() + offset.x()) * self.scale, (rect.y() + offset.y()) * self.scale,
+                      rect.width() * self.scale, rect.height() * self.scale).toAlignedRect().adjusted(-1, -1, 1, 1)
+
+    def update_image_rects(self, rects):
+        """Schedule a repaint of the given image areas only."""
+        region = QRegion()
+        for rect in rects:
+            region += self.widget_rect(rect)
+        if not region.isEmpty():
+            self.update(region)
+
+    def drawing_rects(self):
+        """Image areas covered by the shape being drawn and the cursor cross."""
+        rects = []
+        if self.current and len(self.current):
+            rects.append(self.current.paint_rect())
+            if len(self.line) == 2:
+                rects.append(self.line.paint_rect())
+        if self.pixmap and not self.prev_point.isNull():
+            rects.append(QRectF(0, self.prev_point.y() - 1, self.pixmap.width(), 2))
+            rects.append(QRectF(self.prev_point.x() - 1, 0, 2, self.pixmap.height()))
+        return rects
+
     def change_font_size(self, inc):
         self.label_font_size = max(2, self.label_font_size + inc)
 
@@ -587,6 +635,7 @@ class Canvas(QWidget):
 
         self.current.close()
         self.shapes.append(self.current)
+        self.shape_index.add(self.current)
         self.current = None
         self.set_hiding(False)
         self.newShape.emit()
@@ -651,33 +700,15 @@ class Canvas(QWidget):
             self.move_one_pixel('Down')
 
     def move_one_pixel(self, direction):
-        # print(self.selectedShape.points)
-        if direction == 'Left' and not self.move_out_of_bound(QPointF(-1.0, 0)):
-            # print("move Left one pixel")
-            self.selected_shape.points[0] += QPointF(-1.0, 0)
-            self.selected_shape.points[1] += QPointF(-1.0, 0)
-            self.selected_shape.points[2] += QPointF(-1.0, 0)
-            self.selected_shape.points[3] += QPointF(-1.0, 0)
-        elif direction == 'Right' and not self.move_out_of_bound(QPointF(1.0, 0)):
-            # print("move Right one pixel")
-            self.selected_shape.points[0] += QPointF(1.0, 0)
-            self.selected_shape.points[1] += QPointF(1.0, 0)
-            self.selected_shape.points[2] += QPointF(1.0, 0)
-            self.selected_shape.points[3] += QPointF(1.0, 0)
-        elif direction == 'Up' and not self.move_out_of_bound(QPointF(0, -1.0)):
-            # print("move Up one pixel")
-            self.selected_shape.points[0] += QPointF(0, -1.0)
-            self.selected_shape.points[1] += QPointF(0, -1.0)
-            self.selected_shape.points[2] += QPointF(0, -1.0)
-            self.selected_shape.points[3] += QPointF(0, -1.0)
-        elif direction == 'Down' and not self.move_out_of_bound(QPointF(0, 1.0)):
-            # print("move Down one pixel")
-            self.selected_shape.points[0] += QPointF(0, 1.0)
-            self.selected_shape.points[1] += QPointF(0, 1.0)
-            self.selected_shape.points[2] += QPointF(0, 1.0)
-            self.selected_shape.points[3] += QPointF(0, 1.0)
+        step = {'Left': QPointF(-1.0, 0), 'Right': QPointF(1.0, 0),
+                'Up': QPointF(0, -1.0), 'Down': QPointF(0, 1.0)}[direction]
+        # Move through the shape: its points may be shared with copies and its geometry is cached
+        dirty = self.selected_shape.paint_rect()
+        if not self.move_out_of_bound(step):
+            self.selected_shape.move_by(step)
+        self.shape_index.update(self.selected_shape)
         self.shapeMoved.emit()
-        self.repaint()
+        self.update_image_rects([dirty, self.selected_shape.paint_rect()])
 
     def move_out_of_bound(self, step):
         points = [p1 + p2 for p1, p2 in zip(self.selected_shape.points, [step] * 4)]
@@ -697,6 +728,7 @@ class Canvas(QWidget):
     def undo_last_line(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.remove(self.current)
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -704,6 +736,7 @@ class Canvas(QWidget):
     def reset_all_lines(self):
         assert self.shapes
         self.current = self.shapes.pop()
+        self.shape_index.remove(self.current)
         self.current.set_open()
         self.line.points = [self.current[-1], self.current[0]]
         self.drawingPolygon.emit(True)
@@ -711,19 +744,42 @@ class Canvas(QWidget):
         self.drawingPolygon.emit(False)
         self.update()
 
+    def overlaid_pixmap(self):
+        """The pixmap with the brightness overlay, made again only when the pixmap or color changes."""
+        if not self.overlay_color:
+            self._overlay_key = self._overlay_pixmap = None
+            return self.pixmap
+        key = (self.pixmap.cacheKey(), self.overlay_color.rgba())
+        if key != self._overlay_key:
+            temp = QPixmap(self.pixmap)
+            painter = QPainter(temp)
+            painter.setCompositionMode(painter.CompositionMode_Overlay)
+            painter.fillRect(temp.rect(), self.overlay_color)
+            painter.end()
+            self._overlay_key, self._overlay_pixmap = key, temp
+        return self._overlay_pixmap
+
     def load_pixmap(self, pixmap):
         self.pixmap = pixmap
+        self._overlay_key = self._overlay_pixmap = None
         self.shapes = []
-        self.repaint()
+        self.shape_index.reset(self.shapes, self.grid_cell_size())
+        self.update()
 
     def load_shapes(self, shapes):
         self.shapes = list(shapes)
+        self.shape_index.reset(self.shapes, self.grid_cell_size())
         self.current = None
-        self.repaint()
+        self.update()
+
+    def grid_cell_size(self):
+        if not self.pixmap:
+            return 2 * self.epsilon
+        return max(2 * self.epsilon, max(self.pixmap.width(), self.pixmap.height()) / float(self.grid_cells))
 
     def set_shape_visible(self, shape, value):
         self.visible[shape] = value
-        self.repaint()
+        self.update()
 
     def current_cursor(self):
         cursor = QApplication.overrideCursor()
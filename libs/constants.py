@@ -18,3 +18,7 @@ FORMAT_CREATEML='CreateML'
 SETTING_DRAW_SQUARE = 'draw/square'
 SETTING_LABEL_FILE_FORMAT= 'labelFileFormat'
 DEFAULT_ENCODING = 'utf-8'
+SETTING_PREFETCH_AHEAD = 'prefetch/ahead'
+SETTING_PREFETCH_BEHIND = 'prefetch/behind'
+SETTING_IMAGE_CACHE_BYTES = 'cache/imageBytes'
+DEFAULT_IMAGE_CACHE_BYTES = 512 * 1024 * 1024
@@ -1,15 +1,213 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
 import json
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
 from libs.constants import DEFAULT_ENCODING
 import os
 
 JSON_EXT = '.json'
+JOURNAL_EXT = '.journal'
 ENCODE_METHOD = DEFAULT_ENCODING
 
 
+def read_create_ml_entries(json_path):
+    """
+        Load a CreateML file into an OrderedDict of image name -> image entry,
+        replaying the updates still waiting in its journal.
+    """
+    entries = OrderedDict()
+    if os.path.isfile(json_path):
+        with open(json_path, "r", encoding=ENCODE_METHOD) as file:
+            input_data = file.read()
+        for image in json.loads(input_data) if input_data.strip() else []:
+            entries.setdefault(image["image"], image)
+    journal_path = json_path + JOURNAL_EXT
+    if os.path.isfile(journal_path):
+        with open(journal_path, "r", encoding=ENCODE_METHOD) as journal:
+            for line in journal:
+                try:
+                    image = json.loads(line)
+                except ValueError:
+                    # A torn last line from an interrupted append
+                    continue
+                entries[image["image"]] = image
+    return entries
+
+
+class CreateMLEntryCache(object):
+    """
+        Process wide cache of parsed CreateML files, so a file holding many images
+        is parsed once rather than once per image. Entries are keyed by path and
+        served while the file and its journal keep the same mtime and size.
+    """
+
+    def __init__(self, max_files=64):
+        self.max_files = max_files
+        self.lock = threading.Lock()
+        self.files = OrderedDict()
+
+    def get(self, json_path):
+        """Return the image name -> image entry mapping of `json_path`; do not modify it."""
+        json_path = os.path.abspath(json_path)
+        stamp = (CreateMLStore.file_stamp(json_path), CreateMLStore.file_stamp(json_path + JOURNAL_EXT))
+        with self.lock:
+            cached = self.files.get(json_path)
+            if cached is not None and cached[0] == stamp:
+                self.files.move_to_end(json_path)
+                return cached[1]
+        entries = read_create_ml_entries(json_path)
+        with self.lock:
+            self.files[json_path] = (stamp, entries)
+            self.files.move_to_end(json_path)
+            while len(self.files) > self.max_files:
+                self.files.popitem(last=False)
+        return entries
+
+
+create_ml_entry_cache = CreateMLEntryCache()
+
+
+class CreateMLStore(object):
+    """
+        Incrementally updated CreateML file.
+        Images are indexed by name in memory. Each update is appended as one JSON
+        line to `<output_file>.journal` and the canonical array is rewritten by a
+        background compaction once enough updates have piled up. Files smaller
+        than SYNC_WRITE_BYTES are rewritten directly, without a journal.
+        Replaying the journal is idempotent, so an interrupted compaction only
+        costs the replay on the next open.
+    """
+    SYNC_WRITE_BYTES = 1 << 20
+    COMPACT_EVERY = 64
+
+    stores = {}
+    stores_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, output_file):
+        """Return the store of `output_file`, shared by everything in the process."""
+        output_file = os.path.abspath(output_file)
+        with cls.stores_lock:
+            store = cls.stores.get(output_file)
+            if store is None:
+                store = cls.stores[output_file] = cls(output_file)
+        store.reload_if_changed()
+        return store
+
+    @classmethod
+    def get_open(cls, output_file):
+        with cls.stores_lock:
+            return cls.stores.get(os.path.abspath(output_file))
+
+    @classmethod
+    def close_all(cls):
+        """Compact every open store, leaving only canonical files behind."""
+        with cls.stores_lock:
+            stores = list(cls.stores.values())
+            cls.stores.clear()
+        for store in stores:
+            store.compact()
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.journal_path = output_file + JOURNAL_EXT
+        self.lock = threading.RLock()
+        self.compact_lock = threading.Lock()
+        self.compactor = None
+        self.entries = OrderedDict()
+        self.stamp = None
+        self.journal_stamp = None
+        self.canonical_bytes = 0
+        self.journal_records = 0
+        self.reload()
+
+    @staticmethod
+    def file_stamp(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        with self.lock:
+            self.entries = read_create_ml_entries(self.output_file)
+            self.stamp = self.file_stamp(self.output_file)
+            self.journal_stamp = self.file_stamp(self.journal_path)
+            self.canonical_bytes = self.stamp[1] if self.stamp else 0
+            self.journal_records = 0 if self.journal_stamp is None else self.COMPACT_EVERY
+
+    def reload_if_changed(self):
+        """Pick up changes made to the files by someone else."""
+        with self.lock:
+            if (self.file_stamp(self.output_file) != self.stamp or
+                    self.file_stamp(self.journal_path) != self.journal_stamp):
+                self.reload()
+
+    def get(self, image_name):
+        with self.lock:
+            return self.entries.get(image_name)
+
+    def put(self, image_dict):
+        """Add or replace the entry of one image."""
+        with self.lock:
+            self.reload_if_changed()
+            self.entries[image_dict["image"]] = image_dict
+            if self.journal_stamp is None and self.canonical_bytes < self.SYNC_WRITE_BYTES:
+                self.write_canonical(list(self.entries.values()))
+                return
+            with open(self.journal_path, "a", encoding=ENCODE_METHOD) as journal:
+                journal.write(json.dumps(image_dict) + "\n")
+            self.journal_stamp = self.file_stamp(self.journal_path)
+            self.journal_records += 1
+            if self.journal_records >= self.COMPACT_EVERY and self.compactor is None:
+                self.compactor = threading.Thread(target=self.compact, daemon=True)
+                self.compactor.start()
+
+    def write_canonical(self, images):
+        data = json.dumps(images)
+        tmp_path = '%s.%d.%d.tmp' % (self.output_file, os.getpid(), threading.get_ident())
+        Path(tmp_path).write_text(data, ENCODE_METHOD)
+        os.replace(tmp_path, self.output_file)
+        with self.lock:
+            self.stamp = self.file_stamp(self.output_file)
+            self.canonical_bytes = self.stamp[1] if self.stamp else len(data)
+
+    def compact(self):
+        """Fold the journal into the canonical file."""
+        with self.compact_lock:
+            with self.lock:
+                self.compactor = None
+                if self.journal_stamp is None:
+                    return
+                images = list(self.entries.values())
+                journal_offset = self.journal_stamp[1]
+            self.write_canonical(images)
+            with self.lock:
+                # Keep the updates appended while the canonical file was written
+                with open(self.journal_path, "rb") as journal:
+                    journal.seek(journal_offset)
+                    pending = journal.read()
+                if pending:
+                    tmp_path = self.journal_path + '.tmp'
+                    with open(tmp_path, "wb") as journal:
+                        journal.write(pending)
+                    os.replace(tmp_path, self.journal_path)
+                    self.journal_stamp = self.file_stamp(self.journal_path)
+                    self.journal_records = pending.count(b"\n")
+                else:
+                    os.remove(self.journal_path)
+                    self.journal_stamp = None
+                    self.journal_records = 0
+
+    def flush(self):
+        """Wait for a running compaction and fold in what is left."""
+        self.compact()
+
+
 class CreateMLWriter:
     def __init__(self, folder_name, filename, img_size, shapes, output_file, database_src='Unknown', local_img_path=None):
         self.folder_name = folder_name
@@ -23,13 +221,6 @@ class CreateMLWriter:
         self.output_file = output_file
 
     def write(self):
-        if os.path.isfile(self.output_file):
-            with open(self.output_file, "r") as file:
-                input_data = file.read()
-                output_dict = json.loads(input_data)
-        else:
-            output_dict = []
-
         output_image_dict = {
             "image": self.filename,
             "verified": self.verified,
@@ -57,18 +248,7 @@ class CreateMLWriter:
             }
             output_image_dict["annotations"].append(shape_dict)
 
-        # check if image already in output
-        exists = False
-        for i in range(0, len(output_dict)):
-            if output_dict[i]["image"] == output_image_dict["image"]:
-                exists = True
-                output_dict[i] = output_image_dict
-                break
-
-        if not exists:
-            output_dict.append(output_image_dict)
-
-        Path(self.output_file).write_text(json.dumps(output_dict), ENCODE_METHOD)
+        CreateMLStore.open(self.output_file).put(output_image_dict)
 
     def calculate_coordinates(self, x1, x2, y1, y2):
         if x1 < x2:
@@ -105,21 +285,19 @@ class CreateMLReader:
             print("JSON decoding failed")
 
     def parse_json(self):
-        with open(self.json_path, "r") as file:
-            input_data = file.read()
-
-        # Returns a list
-        output_list = json.loads(input_data)
-
-        if output_list:
-            self.verified = output_list[0].get("verified", False)
+        store = CreateMLStore.get_open(self.json_path)
+        if store is not None:
+            store.reload_if_changed()
+            image = store.get(self.filename)
+        else:
+            image = create_ml_entry_cache.get(self.json_path).get(self.filename)
 
         if len(self.shapes) > 0:
             self.shapes = []
-        for image in output_list:
-            if image["image"] == self.filename:
-                for shape in image["annotations"]:
-                    self.add_shape(shape["label"], shape["coordinates"])
+        if image is not None:
+            self.verified = image.get("verified", False)
+            for shape in image["annotations"]:
+                self.add_shape(shape["label"], shape["coordinates"])
 
     def add_shape(self, label, bnd_box):
         x_min = bnd_box["x"] - (bnd_box["width"] / 2)
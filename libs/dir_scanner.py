@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import time
+
+try:
+    from PyQt5.QtCore import QThread, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QThread, pyqtSignal
+
+from libs.utils import natural_sort_key
+from libs.workspace_cache import ListedDir
+
+
+def image_sort_key(path):
+    """Order of the image list: natural sort, ignoring case."""
+    return natural_sort_key(path.lower())
+
+
+class DirScanner(QThread):
+    """
+        Find the images under a directory on a worker thread.
+        Results are streamed through `found` as batches of absolute paths, each
+        sorted with image_sort_key and paired with their keys. The first batch is
+        sent as soon as the top directory has been listed; later ones once they
+        are large enough or BATCH_SECONDS have passed. Batches grow with the
+        number of images already sent, keeping the merges into the list cheap.
+
+        `listed_dirs` and `listed_paths` are the ListedDir of a previous scan and
+        its sorted image list. Directories whose mtime did not change are not
+        listed again; if none changed, the old list is sent at once through
+        `restored` instead. Once the scan is `complete`, `listed` holds the
+        ListedDir of every directory.
+    """
+    found = pyqtSignal(list, list)
+    restored = pyqtSignal(list)
+    BATCH_SIZE = 256
+    BATCH_SECONDS = 0.5
+    # Directories changed this recently may change again within their mtime resolution
+    MTIME_SLACK_NS = 2 * 10 ** 9
+
+    def __init__(self, dir_path, extensions, skip_dirs=(), listed_dirs=None, listed_paths=None,
+                 parent=None):
+        super(DirScanner, self).__init__(parent)
+        self.dir_path = os.path.abspath(dir_path)
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.skip_dirs = set(skip_dirs)
+        self.listed_dirs = listed_dirs or {}
+        self.listed_paths = listed_paths
+        self.listed = {}
+        self.complete = False
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    @staticmethod
+    def dir_mtime(folder):
+        try:
+            return os.stat(folder).st_mtime_ns
+        except OSError:
+            return None
+
+    def restore(self):
+        """Send the previous image list if no directory changed since it was made."""
+        if self.listed_paths is None or self.dir_path not in self.listed_dirs:
+            return False
+        stack = [self.dir_path]
+        while stack:
+            folder = stack.pop()
+            listed = self.listed_dirs.get(folder)
+            if listed is None or listed.mtime is None or self.dir_mtime(folder) != listed.mtime:
+                return False
+            stack.extend(listed.sub_dirs)
+            self.listed[folder] = listed
+        self.restored.emit(self.listed_paths)
+        return True
+
+    def list_dir(self, folder):
+        """ListedDir of `folder`, reusing the previous listing if the directory did not change."""
+        mtime = self.dir_mtime(folder)
+        if mtime is None:
+            return None
+        listed = self.listed_dirs.get(folder)
+        if listed is not None and listed.mtime == mtime:
+            return listed
+        try:
+            entries = list(os.scandir(folder))
+        except OSError:
+            return None
+        names = []
+        sub_dirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink() and entry.name not in self.skip_dirs:
+                        sub_dirs.append(entry.path)
+                    continue
+            except OSError:
+                continue
+            if entry.name.lower().endswith(self.extensions):
+                names.append(entry.name)
+        if mtime > self.started_ns - self.MTIME_SLACK_NS:
+            mtime = None
+        return ListedDir(mtime, names, sorted(sub_dirs))
+
+    def run(self):
+        self.started_ns = time.time_ns()
+        if self.restore():
+            self.complete = True
+            return
+        self.listed = {}
+        batch = []
+        sent = 0
+        last_sent = time.time()
+        # Depth first like os.walk: symlinked directories are not followed
+        stack = [self.dir_path]
+        while stack and not self.cancelled:
+            folder = stack.pop()
+            listed = self.list_dir(folder)
+            if listed is None:
+                continue
+            self.listed[folder] = listed
+            batch.extend(os.path.join(folder, name) for name in listed.names)
+            stack.extend(reversed(listed.sub_dirs))
+            if batch and (sent == 0 or len(batch) >= max(self.BATCH_SIZE, sent // 4) or
+                          time.time() - last_sent >= self.BATCH_SECONDS):
+                sent += self.send(batch)
+                batch = []
+                last_sent = time.time()
+        if batch and not self.cancelled:
+            self.send(batch)
+        self.complete = not self.cancelled
+
+    def send(self, batch):
+        keys = [image_sort_key(path) for path in batch]
+        order = sorted(range(len(batch)), key=keys.__getitem__)
+        self.found.emit([batch[i] for i in order], [keys[i] for i in order])
+        return len(batch)
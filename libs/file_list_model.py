@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+from array import array
+from itertools import compress
+
+try:
+    from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+except ImportError:
+    from PyQt4.QtCore import QAbstractListModel, QModelIndex, Qt
+
+
+def split_path(path):
+    """Split `path` into its directory, separator included, and its file name."""
+    cut = path.rfind(os.sep)
+    if os.altsep:
+        cut = max(cut, path.rfind(os.altsep))
+    return path[:cut + 1], path[cut + 1:]
+
+
+class PathStore(object):
+    """
+        Compact list of file paths.
+        Directories are interned once; each path only keeps the index of its
+        directory (in an array) and its file name. Supports the read-only list
+        operations used on the image list, plus deletion and sorted merges.
+        index() and `in` are dictionary lookups: file names map to their rows
+        (a list of rows for names found in several directories). The map is
+        extended on appends and rebuilt on first use after other changes.
+        Deleting a path only marks its slot as removed: rows are then mapped to
+        slots through a Fenwick tree over the live slots, so deletions, row
+        accesses and index() all stay O(log n). Removed slots are compacted away
+        once they are half of the store, or before a sorted merge.
+    """
+
+    def __init__(self, paths=()):
+        self.dirs = []
+        self.dir_ids = {}
+        self.path_dirs = array('I')
+        self.names = []
+        # Sort keys, only kept while batches are being merged in
+        self.keys = None
+        # Name -> slot of its first path, and of the others for shared names
+        self.rows = {}
+        self.shared_rows = {}
+        # Live flag of each slot and Fenwick tree of their counts, only while
+        # some slots are removed
+        self.live = None
+        self.tree = None
+        self.removed = 0
+        self.extend(paths)
+
+    def __len__(self):
+        return len(self.names) - self.removed
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if self.removed:
+                return [self[row] for row in range(*index.indices(len(self)))]
+            return [self.dirs[d] + name for d, name in zip(self.path_dirs[index], self.names[index])]
+        slot = self.slot(index)
+        return self.dirs[self.path_dirs[slot]] + self.names[slot]
+
+    def __iter__(self):
+        dirs = self.dirs
+        slots = zip(self.path_dirs, self.names)
+        if self.removed:
+            slots = compress(slots, self.live)
+        for d, name in slots:
+            yield dirs[d] + name
+
+    def __contains__(self, path):
+        try:
+            self.index(path)
+        except ValueError:
+            return False
+        return True
+
+    def __delitem__(self, index):
+        slot = self.slot(index)
+        if not self.removed:
+            count = len(self.names)
+            self.live = bytearray(b'\x01') * count
+            # Every slot counts one: node i covers the (i & -i) slots ending at i
+            self.tree = array('l', (i & -i for i in range(count + 1)))
+        self.live[slot] = 0
+        tree = self.tree
+        i = slot + 1
+        while i < len(tree):
+            tree[i] -= 1
+            i += i & -i
+        self.removed += 1
+        if self.rows is not None:
+            self.unindex(slot)
+        if self.removed * 2 > len(self.names):
+            self.compact()
+
+    def slot(self, row):
+        """Storage slot of the path at `row`."""
+        count = len(self)
+        if row < 0:
+            row += count
+        if not 0 <= row < count:
+            raise IndexError('list index out of range')
+        if not self.removed:
+            return row
+        # Walk down the tree to the last slot with at most `row` live slots before it
+        tree = self.tree
+        slot = 0
+        step = 1 << len(self.names).bit_length()
+        while step:
+            node = slot + step
+            if node < len(tree) and tree[node] <= row:
+                slot = node
+                row -= tree[node]
+            step >>= 1
+        return slot
+
+    def live_before(self, slot):
+        """Number of live slots before `slot`, which is its row if it is live."""
+        if not self.removed:
+            return slot
+        tree = self.tree
+        count = 0
+        while slot:
+            count += tree[slot]
+            slot &= slot - 1
+        return count
+
+    def index(self, path):
+        folder, name = split_path(path)
+        dir_id = self.dir_ids.get(folder)
+        if dir_id is not None:
+            if self.rows is None:
+                self.compact()
+                self.index_rows(0)
+            slot = self.rows.get(name)
+            if slot is not None:
+                if self.path_dirs[slot] == dir_id:
+                    return self.live_before(slot)
+                for slot in self.shared_rows.get(name, ()):
+                    if self.path_dirs[slot] == dir_id:
+                        return self.live_before(slot)
+        raise ValueError('%r is not in the list' % path)
+
+    def index_rows(self, start):
+        """Add the rows from `start` on to the name -> row map, from scratch if `start` is 0."""
+        if start == 0:
+            # Built in C, written backwards so the first row of a name wins
+            count = len(self.names)
+            self.rows = dict(zip(reversed(self.names), range(count - 1, -1, -1)))
+            self.shared_rows = {}
+            if len(self.rows) == count:
+                return
+        rows = self.rows
+        for row in range(start, len(self.names)):
+            name = self.names[row]
+            first = rows.setdefault(name, row)
+            if first != row:
+                self.shared_rows.setdefault(name, []).append(row)
+
+    def unindex(self, slot):
+        """Drop the removed `slot` from the name map."""
+        name = self.names[slot]
+        shared = self.shared_rows.get(name)
+        if self.rows.get(name) == slot:
+            if shared:
+                self.rows[name] = shared.pop(0)
+            else:
+                del self.rows[name]
+        elif shared:
+            shared.remove(slot)
+        if shared is not None and not shared:
+            del self.shared_rows[name]
+
+    def dir_id(self, folder):
+        dir_id = self.dir_ids.get(folder)
+        if dir_id is None:
+            dir_id = self.dir_ids[folder] = len(self.dirs)
+            self.dirs.append(folder)
+        return dir_id
+
+    def extend(self, paths):
+        start = len(self.names)
+        for path in paths:
+            folder, name = split_path(path)
+            self.path_dirs.append(self.dir_id(folder))
+            self.names.append(name)
+        if self.removed:
+            tree = self.tree
+            for i in range(start + 1, len(self.names) + 1):
+                self.live.append(1)
+                # The new node covers itself and the slots of its subtrees
+                tree.append(1 + self.live_before(i - 1) - self.live_before(i - (i & -i)))
+        if self.rows is not None:
+            self.index_rows(start)
+
+    def compact(self):
+        """Drop the removed slots; rows and slots are the same again."""
+        if not self.removed:
+            return
+        live = self.live
+        self.path_dirs = array('I', compress(self.path_dirs, live))
+        self.names = list(compress(self.names, live))
+        if self.keys is not None:
+            self.keys = list(compress(self.keys, live))
+        self.live = None
+        self.tree = None
+        self.removed = 0
+        self.rows = None
+
+    def clear(self):
+        self.__init__()
+
+    def merge(self, paths, keys):
+        """
+            Merge the sorted `paths`, with their sort `keys`, into the list, which
+            must have been built by merges only. Returns the rows the new paths
+            took, in increasing order. Batches sorting after everything are appended.
+        """
+        count = len(self)
+        if self.keys is None:
+            self.keys = []
+        if not self.keys or not keys or keys[0] >= self.keys[-1]:
+            self.extend(paths)
+            self.keys.extend(keys)
+            return list(range(count, count + len(paths)))
+        self.compact()
+        self.rows = None
+        self.extend(paths)
+        all_keys = self.keys + keys
+        # Both runs are sorted, so the stable sort only merges them
+        order = sorted(range(len(all_keys)), key=all_keys.__getitem__)
+        self.path_dirs = array('I', [self.path_dirs[i] for i in order])
+        self.names = [self.names[i] for i in order]
+        self.keys = [all_keys[i] for i in order]
+        return [row for row, i in enumerate(order) if i >= count]
+
+    def drop_keys(self):
+        self.keys = None
+
+
+class FileListModel(QAbstractListModel):
+    """
+        List model of the image paths, for a QListView with uniform item sizes.
+        Images for which `is_annotated(path)` is true are decorated with `annotated_icon`.
+        Tool tips show `describe(path)`, or the path.
+    """
+
+    def __init__(self, parent=None, is_annotated=None, annotated_icon=None, describe=None):
+        super(FileListModel, self).__init__(parent)
+        self.paths = PathStore()
+        self.is_annotated = is_annotated
+        self.annotated_icon = annotated_icon
+        self.describe = describe
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.paths):
+            return None
+        if role == Qt.DisplayRole:
+            return self.paths[index.row()]
+        if role == Qt.ToolTipRole:
+            path = self.paths[index.row()]
+            return self.describe(path) if self.describe is not None else path
+        if role == Qt.DecorationRole and self.is_annotated is not None:
+            return self.annotated_icon if self.is_annotated(self.paths[index.row()]) else None
+        return None
+
+    def refresh_decorations(self):
+        """The annotated state of any image may have changed; views only query the visible rows."""
+        if len(self.paths):
+            self.dataChanged.emit(self.index(0), self.index(len(self.paths) - 1), [Qt.DecorationRole])
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths.clear()
+        self.endResetModel()
+
+    def extend(self, paths):
+        """Append paths that are already in list order."""
+        if paths:
+            count = len(self.paths)
+            self.beginInsertRows(QModelIndex(), count, count + len(paths) - 1)
+            self.paths.extend(paths)
+            self.endInsertRows()
+
+    def merge(self, paths, keys):
+        """Merge a sorted batch of paths, see PathStore.merge. Returns the new rows."""
+        count = len(self.paths)
+        if not paths:
+            return []
+        if self.paths.keys and keys[0] < self.paths.keys[-1]:
+            self.layoutAboutToBeChanged.emit()
+            old_persistent = self.persistentIndexList()
+            old_rows = [index.row() for index in old_persistent]
+            rows = self.paths.merge(paths, keys)
+            # Rows of the old paths, in their new order
+            new_rows = set(rows)
+            moved = [row for row in range(len(self.paths)) if row not in new_rows] if old_persistent else []
+            self.changePersistentIndexList(old_persistent, [self.index(moved[row]) for row in old_rows])
+            self.layoutChanged.emit()
+            return rows
+        self.beginInsertRows(QModelIndex(), count, count + len(paths) - 1)
+        rows = self.paths.merge(paths, keys)
+        self.endInsertRows()
+        return rows
+
+    def remove(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.paths[row]
+        self.endRemoveRows()
+
+    def remove_rows(self, rows):
+        """Remove the given rows, one signal per run of consecutive rows."""
+        rows = sorted(set(rows), reverse=True)
+        while rows:
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1:
+                first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for row in range(last, first - 1, -1):
+                del self.paths[row]
+            self.endRemoveRows()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+from collections import OrderedDict
+
+
+def image_bytes(image):
+    """Memory held by a decoded QImage or QPixmap (width * height * bits per pixel)."""
+    if image is None or image.isNull():
+        return 0
+    return image.width() * image.height() * image.depth() // 8
+
+
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class CachedImage(object):
+
+    def __init__(self, mtime, image, pixmap=None, annotation=None):
+        self.mtime = mtime
+        self.image = image
+        self.pixmap = pixmap
+        # (annotation_path, reader) as found for this image, None if unknown
+        self.annotation = annotation
+        self.size = image_bytes(image) + image_bytes(pixmap)
+
+
+class ImageCache(object):
+    """
+        LRU cache of decoded images and their parsed annotations.
+        Entries are keyed by absolute path and are only served while the file's
+        mtime is unchanged; the least recently used ones are evicted to keep the
+        decoded size within `max_bytes`.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        entry = self.entries.get(path)
+        return entry is not None and entry.mtime == file_mtime(path)
+
+    def get(self, path):
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        if entry.mtime != file_mtime(path):
+            self.discard(path)
+            return None
+        self.entries.move_to_end(path)
+        return entry
+
+    def put(self, path, mtime, image, pixmap=None, annotation=None):
+        self.discard(path)
+        if mtime is None or image is None or image.isNull():
+            return None
+        entry = CachedImage(mtime, image, pixmap, annotation)
+        if entry.size > self.max_bytes:
+            return None
+        self.entries[path] = entry
+        self.total_bytes += entry.size
+        self.evict()
+        return entry
+
+    def attach_pixmap(self, path, pixmap):
+        """Keep the display pixmap of a cached image so it is not converted again."""
+        entry = self.entries.get(path)
+        if entry is None or entry.pixmap is not None:
+            return
+        entry.pixmap = pixmap
+        entry.size += image_bytes(pixmap)
+        self.total_bytes += image_bytes(pixmap)
+        self.entries.move_to_end(path)
+        self.evict()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.size
+
+    def forget_annotation(self, path):
+        entry = self.entries.get(path)
+        if entry is not None:
+            entry.annotation = None
+
+    def forget_annotations(self):
+        for entry in self.entries.values():
+            entry.annotation = None
+
+    def discard(self, path):
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+"""
+    Read image dimensions from the file header without decoding the pixels.
+    Supported formats are JPEG, PNG, BMP, GIF, TIFF and WebP.
+"""
+import os
+import struct
+from functools import lru_cache
+
+# JPEG start-of-frame markers; C4 (DHT), C8 (JPG) and CC (DAC) share the range
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+EXIF_ORIENTATION_TAG = 0x0112
+TIFF_WIDTH_TAG = 256
+TIFF_HEIGHT_TAG = 257
+TIFF_PHOTOMETRIC_TAG = 262
+TIFF_TYPE_SIZES = {1: 1, 3: 2, 4: 4}
+
+
+def read_image_shape(image_path):
+    """
+        Return [height, width, depth] of an image, using the same convention as the
+        label writers (depth is 1 for grayscale images and 3 otherwise).
+        JPEG EXIF orientation is applied, matching the auto-transformed image shown
+        in the canvas. Returns None if the format is not recognised.
+    """
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+    shape = _read_image_shape(image_path, stat.st_mtime_ns, stat.st_size)
+    return list(shape) if shape is not None else None
+
+
+@lru_cache(maxsize=4096)
+def _read_image_shape(image_path, mtime, size):
+    try:
+        with open(image_path, 'rb') as f:
+            head = f.read(32)
+            if head[:2] == b'\xff\xd8':
+                return _jpeg_shape(f)
+            if head[:8] == b'\x89PNG\r\n\x1a\n':
+                return _png_shape(f, head)
+            if head[:2] == b'BM':
+                return _bmp_shape(f, head)
+            if head[:6] in (b'GIF87a', b'GIF89a'):
+                return _gif_shape(f, head)
+            if head[:4] in (b'II*\x00', b'MM\x00*'):
+                return _tiff_shape(f, 0)
+            if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+                return _webp_shape(head)
+    except (OSError, struct.error, ValueError):
+        pass
+    return None
+
+
+def _is_gray_palette(palette, entry_size):
+    for i in range(0, len(palette) - entry_size + 1, entry_size):
+        if not palette[i] == palette[i + 1] == palette[i + 2]:
+            return False
+    return True
+
+
+def _jpeg_shape(f):
+    f.seek(2)
+    orientation = 1
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header
+            return None
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            # Standalone markers carry no length
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if marker in JPEG_SOF_MARKERS:
+            _, height, width, components = struct.unpack('>BHHB', f.read(6))
+            if orientation in (5, 6, 7, 8):
+                width, height = height, width
+            return height, width, 1 if components == 1 else 3
+        start = f.tell()
+        if marker == 0xE1 and f.read(6) == b'Exif\x00\x00':
+            orientation = _tiff_orientation(f, f.tell()) or orientation
+        f.seek(start + length - 2)
+
+
+def _png_shape(f, head):
+    width, height = struct.unpack('>II', head[16:24])
+    color_type = head[25]
+    if color_type in (0, 4):
+        return height, width, 1
+    if color_type == 3:
+        # Palette images are grayscale when every PLTE entry is gray
+        f.seek(33)
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            length, chunk_type = struct.unpack('>I4s', chunk)
+            if chunk_type == b'PLTE':
+                return height, width, 1 if _is_gray_palette(f.read(length), 3) else 3
+            if chunk_type == b'IDAT':
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    return height, width, 3
+
+
+def _bmp_shape(f, head):
+    header_size = struct.unpack('<I', head[14:18])[0]
+    if header_size == 12:
+        width, height, _, bit_count = struct.unpack('<HHHH', head[18:26])
+        entry_size = 3
+    else:
+        width, height, _, bit_count = struct.unpack('<iiHH', head[18:30])
+        entry_size = 4
+    if bit_count <= 8:
+        colors = 1 << bit_count
+        if header_size >= 40:
+            f.seek(46)
+            colors = struct.unpack('<I', f.read(4))[0] or colors
+        f.seek(14 + header_size)
+        if _is_gray_palette(f.read(colors * entry_size), entry_size):
+            return abs(height), width, 1
+    return abs(height), width, 3
+
+
+def _gif_shape(f, head):
+    width, height, flags = struct.unpack('<HHB', head[6:11])
+    if flags & 0x80:
+        f.seek(13)
+        if _is_gray_palette(f.read(3 << ((flags & 0x07) + 1)), 3):
+            return height, width, 1
+    return height, width, 3
+
+
+def _tiff_entries(f, base):
+    """Yield (tag, value) for the short/long entries of the first IFD of a TIFF stream at `base`."""
+    f.seek(base)
+    order = '<' if f.read(2) == b'II' else '>'
+    f.seek(base + 4)
+    f.seek(base + struct.unpack(order + 'I', f.read(4))[0])
+    count = struct.unpack(order + 'H', f.read(2))[0]
+    for _ in range(count):
+        tag, value_type, value_count, value = struct.unpack(order + 'HHI4s', f.read(12))
+        size = TIFF_TYPE_SIZES.get(value_type)
+        if size is None or value_count != 1:
+            continue
+        yield tag, struct.unpack(order + {1: 'B', 2: 'H', 4: 'I'}[size], value[:size])[0]
+
+
+def _tiff_orientation(f, base):
+    for tag, value in _tiff_entries(f, base):
+        if tag == EXIF_ORIENTATION_TAG:
+            return value
+    return None
+
+
+def _tiff_shape(f, base):
+    tags = dict(_tiff_entries(f, base))
+    if TIFF_WIDTH_TAG not in tags or TIFF_HEIGHT_TAG not in tags:
+        return None
+    gray = tags.get(TIFF_PHOTOMETRIC_TAG) in (0, 1)
+    return tags[TIFF_HEIGHT_TAG], tags[TIFF_WIDTH_TAG], 1 if gray else 3
+
+
+def _webp_shape(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', head[26:30])
+        return height & 0x3FFF, width & 0x3FFF, 3
+    if chunk == b'VP8L':
+        bits = struct.unpack('<I', head[21:25])[0]
+        return ((bits >> 14) & 0x3FFF) + 1, (bits & 0x3FFF) + 1, 3
+    if chunk == b'VP8X':
+        width = int.from_bytes(head[24:27], 'little') + 1
+        height = int.from_bytes(head[27:30], 'little') + 1
+        return height, width, 3
+    return None
@@ -10,6 +10,7 @@ import os.path
 from enum import Enum
 
 from libs.create_ml_io import CreateMLWriter
+from libs.image_header import read_image_shape
 from libs.pascal_voc_io import PascalVocWriter
 from libs.pascal_voc_io import XML_EXT
 from libs.yolo_io import YOLOWriter
@@ -40,10 +41,7 @@ class LabelFile(object):
         img_folder_name = os.path.basename(os.path.dirname(image_path))
         img_file_name = os.path.basename(image_path)
 
-        image = QImage()
-        image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.get_image_shape(image_path, image_data)
         writer = CreateMLWriter(img_folder_name, img_file_name,
                                 image_shape, shapes, filename, local_img_path=image_path)
         writer.verified = self.verified
@@ -59,13 +57,7 @@ class LabelFile(object):
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
         # Read from file path because self.imageData might be empty if saving to
         # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.get_image_shape(image_path, image_data)
         writer = PascalVocWriter(img_folder_name, img_file_name,
                                  image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -89,13 +81,7 @@ class LabelFile(object):
         # imgFileNameWithoutExt = os.path.splitext(img_file_name)[0]
         # Read from file path because self.imageData might be empty if saving to
         # Pascal format
-        if isinstance(image_data, QImage):
-            image = image_data
-        else:
-            image = QImage()
-            image.load(image_path)
-        image_shape = [image.height(), image.width(),
-                       1 if image.isGrayscale() else 3]
+        image_shape = LabelFile.get_image_shape(image_path, image_data)
         writer = YOLOWriter(img_folder_name, img_file_name,
                             image_shape, local_img_path=image_path)
         writer.verified = self.verified
@@ -148,6 +134,23 @@ class LabelFile(object):
         file_suffix = os.path.splitext(filename)[1].lower()
         return file_suffix == LabelFile.suffix
 
+    @staticmethod
+    def get_image_shape(image_path, image_data=None):
+        """
+            Return [height, width, depth] of the image. Unless it is already decoded,
+            the size is read from the file header instead of decoding the whole image.
+        """
+        if isinstance(image_data, QImage):
+            image = image_data
+        else:
+            image_shape = read_image_shape(image_path)
+            if image_shape is not None:
+                return image_shape
+            image = QImage()
+            image.load(image_path)
+        return [image.height(), image.width(),
+                1 if image.isGrayscale() else 3]
+
     @staticmethod
     def convert_points_to_bnd_box(points):
         x_min = float('inf')
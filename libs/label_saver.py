@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import threading
+from collections import Counter, OrderedDict
+
+try:
+    from PyQt5.QtCore import QObject, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QObject, pyqtSignal
+
+
+class LabelSaver(QObject):
+    """
+        Write-behind queue for annotation files.
+        Writes are run in submission order on one background thread. A write that
+        is still queued is replaced when a newer one for the same image and
+        annotation file arrives. Jobs must only use the snapshot they were built
+        from, never the widgets. Results are reported through `saved` and
+        `failed`, which are delivered on the thread that owns the saver.
+    """
+    saved = pyqtSignal(str, str)  # image path, annotation path
+    failed = pyqtSignal(str, str, str)  # image path, annotation path, error
+    finished = pyqtSignal(str, str, str)
+
+    def __init__(self, parent=None):
+        super(LabelSaver, self).__init__(parent)
+        self.condition = threading.Condition()
+        self.pending = OrderedDict()
+        self.running = None
+        self.stopped = False
+        # Submitted writes whose result has not been delivered yet, per image
+        self.outstanding = Counter()
+        self.finished.connect(self.on_finished)
+        self.thread = threading.Thread(target=self.run, name='LabelSaver', daemon=True)
+        self.thread.start()
+
+    def submit(self, image_path, annotation_path, write):
+        """Queue `write()` to save the annotation of `image_path` to `annotation_path`."""
+        key = (image_path, annotation_path)
+        with self.condition:
+            if key not in self.pending:
+                self.outstanding[image_path] += 1
+            self.pending[key] = write
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                key, write = self.pending.popitem(last=False)
+                self.running = key
+            try:
+                write()
+                error = ''
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+            self.finished.emit(key[0], key[1], error)
+            with self.condition:
+                self.running = None
+                self.condition.notify_all()
+
+    def on_finished(self, image_path, annotation_path, error):
+        self.outstanding[image_path] -= 1
+        if self.outstanding[image_path] <= 0:
+            del self.outstanding[image_path]
+        if error:
+            self.failed.emit(image_path, annotation_path, error)
+        else:
+            self.saved.emit(image_path, annotation_path)
+
+    def busy(self, image_path=None):
+        keys = list(self.pending)
+        if self.running is not None:
+            keys.append(self.running)
+        return any(image_path is None or key[0] == image_path for key in keys)
+
+    def flush(self, image_path=None):
+        """
+            Wait until the queued writes for `image_path` (or all of them) are on disk.
+            Returns True if any write for it was submitted and has not been reported yet.
+        """
+        with self.condition:
+            while self.busy(image_path):
+                self.condition.wait()
+        if image_path is None:
+            return bool(self.outstanding)
+        return image_path in self.outstanding
+
+    def shutdown(self):
+        """Write everything still queued and stop the thread."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join()
@@ -1,6 +1,9 @@
 #!/usr/bin/env python
 # -*- coding: utf8 -*-
+import os
 import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement
 from lxml import etree
@@ -8,10 +11,38 @@ import codecs
 from libs.constants import DEFAULT_ENCODING
 from libs.ustr import ustr
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 XML_EXT = '.xml'
 ENCODE_METHOD = DEFAULT_ENCODING
 
+OBJECT_XML = ('\t<object>\n'
+              '\t\t%s\n'
+              '\t\t<pose>Unspecified</pose>\n'
+              '\t\t<truncated>%d</truncated>\n'
+              '\t\t<difficult>%d</difficult>\n'
+              '\t\t<bndbox>\n'
+              '\t\t\t<xmin>%s</xmin>\n'
+              '\t\t\t<ymin>%s</ymin>\n'
+              '\t\t\t<xmax>%s</xmax>\n'
+              '\t\t\t<ymax>%s</ymax>\n'
+              '\t\t</bndbox>\n'
+              '\t</object>')
+
+
+def escape_text(text):
+    """
+        Escape element text the way the ElementTree -> lxml round trip does,
+        including the XML parser's line-end normalisation.
+    """
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')\
+        .replace('\r\n', '\n').replace('\r', '\n')
+
+
 class PascalVocWriter:
 
     def __init__(self, folder_name, filename, img_size, database_src='Unknown', local_img_path=None):
@@ -83,6 +114,13 @@ class PascalVocWriter:
         bnd_box['difficult'] = difficult
         self.box_list.append(bnd_box)
 
+    def is_truncated(self, each_object):
+        if int(float(each_object['ymax'])) == int(float(self.img_size[0])) or (int(float(each_object['ymin'])) == 1):
+            return True  # max == height or min
+        elif (int(float(each_object['xmax'])) == int(float(self.img_size[1]))) or (int(float(each_object['xmin'])) == 1):
+            return True  # max == width or min
+        return False
+
     def append_objects(self, top):
         for each_object in self.box_list:
             object_item = SubElement(top, 'object')
@@ -91,12 +129,7 @@ class PascalVocWriter:
             pose = SubElement(object_item, 'pose')
             pose.text = "Unspecified"
             truncated = SubElement(object_item, 'truncated')
-            if int(float(each_object['ymax'])) == int(float(self.img_size[0])) or (int(float(each_object['ymin'])) == 1):
-                truncated.text = "1"  # max == height or min
-            elif (int(float(each_object['xmax'])) == int(float(self.img_size[1]))) or (int(float(each_object['xmin'])) == 1):
-                truncated.text = "1"  # max == width or min
-            else:
-                truncated.text = "0"
+            truncated.text = "1" if self.is_truncated(each_object) else "0"
             difficult = SubElement(object_item, 'difficult')
             difficult.text = str(bool(each_object['difficult']) & 1)
             bnd_box = SubElement(object_item, 'bndbox')
@@ -109,9 +142,54 @@ class PascalVocWriter:
             y_max = SubElement(bnd_box, 'ymax')
             y_max.text = str(each_object['ymax'])
 
+    def to_xml(self):
+        """
+            Return the tab-indented annotation XML in a single pass. The output matches
+            gen_xml + append_objects + prettify, except that double spaces inside
+            text are kept instead of being turned into tabs.
+        """
+        if self.filename is None or \
+                self.folder_name is None or \
+                self.img_size is None:
+            return None
+
+        lines = []
+        append = lines.append
+
+        def element(indent, tag, text):
+            text = ustr(text) if text is not None else ''
+            if text:
+                append('%s<%s>%s</%s>' % (indent, tag, escape_text(text), tag))
+            else:
+                append('%s<%s/>' % (indent, tag))
+
+        append('<annotation verified="yes">' if self.verified else '<annotation>')
+        element('\t', 'folder', self.folder_name)
+        element('\t', 'filename', self.filename)
+        if self.local_img_path is not None:
+            element('\t', 'path', self.local_img_path)
+        append('\t<source>')
+        element('\t\t', 'database', self.database_src)
+        append('\t</source>')
+        append('\t<size>')
+        element('\t\t', 'width', str(self.img_size[1]))
+        element('\t\t', 'height', str(self.img_size[0]))
+        element('\t\t', 'depth', str(self.img_size[2]) if len(self.img_size) == 3 else '1')
+        append('\t</size>')
+        element('\t', 'segmented', '0')
+
+        for each_object in self.box_list:
+            name = ustr(each_object['name']) if each_object['name'] is not None else ''
+            append(OBJECT_XML % ('<name>%s</name>' % escape_text(name) if name else '<name/>',
+                                 self.is_truncated(each_object),
+                                 bool(each_object['difficult']) & 1,
+                                 each_object['xmin'], each_object['ymin'],
+                                 each_object['xmax'], each_object['ymax']))
+        append('</annotation>\n')
+        return '\n'.join(lines)
+
     def save(self, target_file=None):
-        root = self.gen_xml()
-        self.append_objects(root)
+        xml = self.to_xml()
         out_file = None
         if target_file is None:
             out_file = codecs.open(
@@ -119,8 +197,7 @@ class PascalVocWriter:
         else:
             out_file = codecs.open(target_file, 'w', encoding=ENCODE_METHOD)
 
-        prettify_result = self.prettify(root)
-        out_file.write(prettify_result.decode('utf8'))
+        out_file.write(xml)
         out_file.close()
 
 
@@ -169,3 +246,112 @@ class PascalVocReader:
                 difficult = bool(int(object_iter.find('difficult').text))
             self.add_shape(label, bnd_box, difficult)
         return True
+
+
+# Columnar view of a directory of PASCAL VOC files, see read_voc_directory
+VocColumns = namedtuple('VocColumns', [
+    'file_paths',   # list of F annotation paths, sorted
+    'image_sizes',  # int32 (F, 3): height, width, depth from <size>, 0 if missing
+    'verified',     # bool (F,)
+    'offsets',      # int64 (F + 1,): boxes of file i are boxes[offsets[i]:offsets[i + 1]]
+    'boxes',        # int32 (N, 4): xmin, ymin, xmax, ymax
+    'labels',       # int32 (N,): index into label_names
+    'label_names',  # list of label names in order of first appearance
+    'difficult',    # bool (N,)
+])
+
+VOC_CHUNK_SIZE = 256
+
+
+def _voc_int(element, tag):
+    child = element.find(tag)
+    if child is None or not child.text:
+        return 0
+    return int(float(child.text))
+
+
+def _parse_voc_chunk(file_paths):
+    """
+        Parse a batch of VOC files into compact arrays, with label codes local to the batch.
+        Files that cannot be parsed are reported with no boxes, like PascalVocReader does.
+    """
+    sizes = np.zeros((len(file_paths), 3), dtype=np.int32)
+    verified = np.zeros(len(file_paths), dtype=bool)
+    counts = np.zeros(len(file_paths), dtype=np.int64)
+    boxes, labels, difficult = [], [], []
+    label_codes = {}
+    parser = etree.XMLParser(encoding=ENCODE_METHOD)
+    for i, file_path in enumerate(file_paths):
+        try:
+            root = etree.parse(file_path, parser=parser).getroot()
+        except (OSError, etree.XMLSyntaxError):
+            continue
+        verified[i] = root.get('verified') == 'yes'
+        size = root.find('size')
+        if size is not None:
+            try:
+                sizes[i] = (_voc_int(size, 'height'), _voc_int(size, 'width'), _voc_int(size, 'depth'))
+            except ValueError:
+                pass
+        for object_iter in root.iterfind('object'):
+            bnd_box = object_iter.find('bndbox')
+            try:
+                box = (_voc_int(bnd_box, 'xmin'), _voc_int(bnd_box, 'ymin'),
+                       _voc_int(bnd_box, 'xmax'), _voc_int(bnd_box, 'ymax'))
+                is_difficult = bool(_voc_int(object_iter, 'difficult'))
+            except (AttributeError, ValueError):
+                continue
+            label = object_iter.findtext('name') or ''
+            boxes.append(box)
+            labels.append(label_codes.setdefault(label, len(label_codes)))
+            difficult.append(is_difficult)
+            counts[i] += 1
+    return (sizes, verified, counts,
+            np.array(boxes, dtype=np.int32).reshape(-1, 4),
+            np.array(labels, dtype=np.int32),
+            list(label_codes),
+            np.array(difficult, dtype=bool))
+
+
+def read_voc_directory(path, workers=None):
+    """
+        Parse every PASCAL VOC .xml file in `path` into a VocColumns of NumPy arrays.
+        Files are parsed with lxml in a pool of `workers` processes (the CPU count by
+        default, in-process when 1 or less). Callers using the process pool on
+        platforms that spawn workers need the usual `if __name__ == '__main__'` guard.
+    """
+    if np is None:
+        raise ImportError('read_voc_directory requires numpy')
+    file_paths = sorted(entry.path for entry in os.scandir(path)
+                        if entry.is_file() and entry.name.lower().endswith(XML_EXT))
+    chunks = [file_paths[i:i + VOC_CHUNK_SIZE] for i in range(0, len(file_paths), VOC_CHUNK_SIZE)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        results = [_parse_voc_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_parse_voc_chunk, chunks))
+
+    # Re-code the per-batch labels against one table
+    label_codes, labels = {}, []
+    for _, _, _, _, chunk_labels, chunk_names, _ in results:
+        remap = np.array([label_codes.setdefault(name, len(label_codes)) for name in chunk_names] or [0],
+                         dtype=np.int32)
+        labels.append(remap[chunk_labels])
+    label_names = list(label_codes)
+
+    def concat(column, empty):
+        arrays = [result[column] for result in results]
+        return np.concatenate(arrays) if arrays else empty
+
+    counts = concat(2, np.zeros(0, dtype=np.int64))
+    return VocColumns(
+        file_paths=file_paths,
+        image_sizes=concat(0, np.zeros((0, 3), dtype=np.int32)),
+        verified=concat(1, np.zeros(0, dtype=bool)),
+        offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+        boxes=concat(3, np.zeros((0, 4), dtype=np.int32)),
+        labels=np.concatenate(labels) if labels else np.zeros(0, dtype=np.int32),
+        label_names=label_names,
+        difficult=concat(6, np.zeros(0, dtype=bool)))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImagePrefetcher(object):
+    """
+        Decode images (and parse their annotations) on worker threads ahead of navigation.
+        `load` is called with an image path on a worker thread, so it must not touch any widget.
+    """
+
+    def __init__(self, load, max_workers=2):
+        self.load = load
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+
+    def prefetch(self, paths):
+        """
+            Make `paths` the prefetch window: jobs for any other path are cancelled,
+            missing ones are submitted in the given order.
+        """
+        wanted = set(paths)
+        for path in list(self.futures):
+            if path not in wanted:
+                self.futures.pop(path).cancel()
+        for path in paths:
+            if path not in self.futures:
+                self.futures[path] = self.executor.submit(self.load, path)
+
+    def take(self, path):
+        """
+            Return the prefetched result for `path`, waiting if its job is still running.
+            Returns None if `path` was never prefetched or its job failed.
+        """
+        future = self.futures.pop(path, None)
+        if future is None or future.cancel():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def collect(self):
+        """Remove and return (path, result) for every job that has finished successfully."""
+        finished = []
+        for path, future in list(self.futures.items()):
+            if future.done():
+                del self.futures[path]
+                if not future.cancelled() and future.exception() is None:
+                    finished.append((path, future.result()))
+        return finished
+
+    def discard(self, path):
+        future = self.futures.pop(path, None)
+        if future is not None:
+            future.cancel()
+
+    def clear(self):
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False)
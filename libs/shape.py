@@ -10,7 +10,6 @@ except ImportError:
     from PyQt4.QtCore import *
 
 from libs.utils import distance
-import sys
 
 DEFAULT_LINE_COLOR = QColor(0, 255, 0, 128)
 # DEFAULT_FILL_COLOR = QColor(255, 0, 0, 128)
@@ -22,6 +21,16 @@ DEFAULT_SELECT_FILL_COLOR = QColor(0, 128, 255, 175)
 DEFAULT_VERTEX_FILL_COLOR = QColor(0, 255, 0, 255)
 DEFAULT_HVERTEX_FILL_COLOR = QColor(255, 0, 0)
 
+_label_fonts = {}
+
+
+def label_font(size):
+    font = _label_fonts.get(size)
+    if font is None:
+        font = _label_fonts[size] = QFont()
+        font.setPointSize(size)
+    return font
+
 
 class Shape(object):
     P_SQUARE, P_ROUND = range(2)
@@ -43,6 +52,14 @@ class Shape(object):
 
     def __init__(self, label=None, line_color=None, difficult=False, paint_label=False):
         self.label = label
+        # Geometry built from the points, dropped by invalidate() when they change
+        self._path = None
+        self._line_path = None
+        self._vertex_path = None
+        self._vertex_key = None
+        self._rect = None
+        self._paint_rect = None
+        self._paint_key = None
         self.points = []
         self.fill = False
         self.selected = False
@@ -64,8 +81,26 @@ class Shape(object):
             # is used for drawing the pending line a different color.
             self.line_color = line_color
 
+    @property
+    def points(self):
+        """The vertices. Change them through the Shape, or assign a new list, never in place."""
+        return self._points
+
+    @points.setter
+    def points(self, points):
+        self._points = points
+        self.invalidate()
+
+    def invalidate(self):
+        self._path = None
+        self._line_path = None
+        self._vertex_path = None
+        self._rect = None
+        self._paint_rect = None
+
     def close(self):
         self._closed = True
+        self._line_path = None
 
     def reach_max_points(self):
         if len(self.points) >= 4:
@@ -75,9 +110,11 @@ class Shape(object):
     def add_point(self, point):
         if not self.reach_max_points():
             self.points.append(point)
+            self.invalidate()
 
     def pop_point(self):
         if self.points:
+            self.invalidate()
             return self.points.pop()
         return None
 
@@ -86,6 +123,7 @@ class Shape(object):
 
     def set_open(self):
         self._closed = False
+        self._line_path = None
 
     def paint(self, painter):
         if self.points:
@@ -95,20 +133,8 @@ class Shape(object):
             pen.setWidth(max(1, int(round(2.0 / self.scale))))
             painter.setPen(pen)
 
-            line_path = QPainterPath()
-            vertex_path = QPainterPath()
-
-            line_path.moveTo(self.points[0])
-            # Uncommenting the following line will draw 2 paths
-            # for the 1st vertex, and make it non-filled, which
-            # may be desirable.
-            # self.drawVertex(vertex_path, 0)
-
-            for i, p in enumerate(self.points):
-                line_path.lineTo(p)
-                self.draw_vertex(vertex_path, i)
-            if self.is_closed():
-                line_path.lineTo(self.points[0])
+            line_path = self.line_path()
+            vertex_path = self.vertex_path()
 
             painter.drawPath(line_path)
             painter.drawPath(vertex_path)
@@ -121,27 +147,65 @@ class Shape(object):
                 pen.setColor(color)
                 painter.setPen(pen)
 
-                min_x = sys.maxsize
-                min_y = sys.maxsize
-                min_y_label = int(1.25 * self.label_font_size)
-                for point in self.points:
-                    min_x = min(min_x, point.x())
-                    min_y = min(min_y, point.y())
-                if min_x != sys.maxsize and min_y != sys.maxsize:
-                    font = QFont()
-                    font.setPointSize(self.label_font_size)
-                    # font.setBold(True)
-                    painter.setFont(font)
-                    if self.label is None:
-                        self.label = ""
-                    if min_y < min_y_label:
-                        min_y += min_y_label
-                    painter.drawText(int(min_x), int(min_y), self.label)
+                # font.setBold(True)
+                painter.setFont(label_font(self.label_font_size))
+                if self.label is None:
+                    self.label = ""
+                painter.drawText(self.label_position(), self.label)
 
             if self.fill:
                 color = self.select_fill_color if self.selected else self.fill_color
                 painter.fillPath(line_path, color)
 
+    def label_position(self):
+        """Baseline origin of the label: the top-left corner, pushed down near the image top."""
+        rect = self.bounding_rect()
+        min_x = rect.left()
+        min_y = rect.top()
+        min_y_label = int(1.25 * self.label_font_size)
+        if min_y < min_y_label:
+            min_y += min_y_label
+        return QPoint(int(min_x), int(min_y))
+
+    def paint_rect(self):
+        """Area that paint() may cover, in image coordinates. Shared until it changes: do not modify it."""
+        key = (self.scale, self.point_size, self.paint_label, self.label, self.label_font_size)
+        if self._paint_rect is None or key != self._paint_key:
+            # Pen and the largest (highlighted) vertex marker
+            margin = max(1, int(round(2.0 / self.scale))) + \
+                self.point_size * max(size for size, _ in self._highlight_settings.values()) / 2.0
+            rect = self.bounding_rect().adjusted(-margin, -margin, margin, margin)
+            if self.paint_label:
+                metrics = QFontMetricsF(label_font(self.label_font_size))
+                label_rect = metrics.boundingRect(self.label or "").translated(QPointF(self.label_position()))
+                rect = rect.united(label_rect.adjusted(-margin, -margin, margin, margin))
+            self._paint_rect, self._paint_key = rect, key
+        return self._paint_rect
+
+    def line_path(self):
+        if self._line_path is None:
+            line_path = QPainterPath()
+            line_path.moveTo(self.points[0])
+            # Uncommenting the following line will draw 2 paths
+            # for the 1st vertex, and make it non-filled, which
+            # may be desirable.
+            # self.drawVertex(vertex_path, 0)
+            for p in self.points:
+                line_path.lineTo(p)
+            if self.is_closed():
+                line_path.lineTo(self.points[0])
+            self._line_path = line_path
+        return self._line_path
+
+    def vertex_path(self):
+        key = (self._highlight_index, self._highlight_mode, self.point_size, self.point_type)
+        if self._vertex_path is None or key != self._vertex_key:
+            vertex_path = QPainterPath()
+            for i in range(len(self.points)):
+                self.draw_vertex(vertex_path, i)
+            self._vertex_path, self._vertex_key = vertex_path, key
+        return self._vertex_path
+
     def draw_vertex(self, path, i):
         # d = self.point_size / self.scale
         d = self.point_size
@@ -171,7 +235,7 @@ class Shape(object):
         return index
 
     def contains_point(self, point):
-        return self.make_path().contains(point)
+        return self.path().contains(point)
 
     def make_path(self):
         path = QPainterPath(self.points[0])
@@ -179,14 +243,23 @@ class Shape(object):
             path.lineTo(p)
         return path
 
+    def path(self):
+        """The outline as built by make_path, shared until the points change."""
+        if self._path is None:
+            self._path = self.make_path()
+        return self._path
+
     def bounding_rect(self):
-        return self.make_path().boundingRect()
+        """Bounding rect of the outline, shared until the points change: do not modify it."""
+        if self._rect is None:
+            self._rect = self.path().boundingRect()
+        return self._rect
 
     def move_by(self, offset):
         self.points = [p + offset for p in self.points]
 
     def move_vertex_by(self, i, offset):
-        self.points[i] = self.points[i] + offset
+        self[i] = self.points[i] + offset
 
     def highlight_vertex(self, i, action):
         self._highlight_index = i
@@ -216,3 +289,4 @@ class Shape(object):
 
     def __setitem__(self, key, value):
         self.points[key] = value
+        self.invalidate()
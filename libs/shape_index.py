@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import math
+
+
+class ShapeGrid(object):
+    """
+        Uniform grid over the bounding rects of the canvas shapes, for hit tests.
+        A shape is listed in every cell its rect, grown by `margin`, overlaps, so
+        the shapes a point may hit are the ones listed in its cell. The grid
+        must be told about every shape added, moved or removed; shapes keep the
+        order in which they were added, like the canvas list they mirror.
+    """
+
+    def __init__(self, cell_size=64.0, margin=0.0):
+        self.margin = margin
+        self.reset([], cell_size)
+
+    def reset(self, shapes, cell_size=None):
+        if cell_size is not None:
+            self.cell_size = float(cell_size)
+        # (column, row) -> shapes listed in that cell
+        self.cells = {}
+        # shape -> (first column, first row, last column, last row) it is listed in
+        self.ranges = {}
+        # shape -> rank, increasing in the order the shapes were added
+        self.ranks = {}
+        self.next_rank = 0
+        for shape in shapes:
+            self.add(shape)
+
+    def __contains__(self, shape):
+        return shape in self.ranges
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def cell_range(self, shape):
+        rect = shape.bounding_rect()
+        size = self.cell_size
+        return (int(math.floor((rect.left() - self.margin) / size)),
+                int(math.floor((rect.top() - self.margin) / size)),
+                int(math.floor((rect.right() + self.margin) / size)),
+                int(math.floor((rect.bottom() + self.margin) / size)))
+
+    def insert(self, shape, cell_range):
+        self.ranges[shape] = cell_range
+        first_column, first_row, last_column, last_row = cell_range
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                self.cells.setdefault((column, row), set()).add(shape)
+
+    def discard(self, shape):
+        first_column, first_row, last_column, last_row = self.ranges.pop(shape)
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self.cells[column, row]
+                cell.discard(shape)
+                if not cell:
+                    del self.cells[column, row]
+
+    def add(self, shape):
+        if shape in self.ranges:
+            self.discard(shape)
+        self.ranks[shape] = self.next_rank
+        self.next_rank += 1
+        self.insert(shape, self.cell_range(shape))
+
+    def remove(self, shape):
+        if shape in self.ranges:
+            self.discard(shape)
+            del self.ranks[shape]
+
+    def update(self, shape):
+        """Follow a shape that moved; shapes that are not indexed are ignored."""
+        old_range = self.ranges.get(shape)
+        if old_range is None:
+            return
+        new_range = self.cell_range(shape)
+        if new_range != old_range:
+            self.discard(shape)
+            self.insert(shape, new_range)
+
+    def candidates(self, point):
+        """Shapes whose grown rect may contain `point`, in the order they were added."""
+        size = self.cell_size
+        cell = self.cells.get((int(math.floor(point.x() / size)), int(math.floor(point.y() / size))))
+        if not cell:
+            return []
+        return sorted(cell, key=self.ranks.__getitem__)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import shutil
+
+try:
+    from PyQt5.QtCore import QThread, pyqtSignal
+except ImportError:
+    from PyQt4.QtCore import QThread, pyqtSignal
+
+# Directory, under the opened directory, receiving the deleted images
+TRASH_DIR_NAME = '.labelImgTrash'
+
+
+def trash_path(trash_dir, root, path):
+    """Free path in `trash_dir` for `path`, keeping its location relative to `root`."""
+    relative = os.path.relpath(path, root)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(path)
+    target = os.path.join(trash_dir, relative)
+    base, ext = os.path.splitext(target)
+    copy = 1
+    while os.path.lexists(target):
+        target = '%s (%d)%s' % (base, copy, ext)
+        copy += 1
+    return target
+
+
+class TrashMover(QThread):
+    """
+        Move files into the trash directory of `root` on a worker thread.
+        `moved` reports the files that were moved, then the errors of the others.
+    """
+    moved = pyqtSignal(list, list)
+
+    def __init__(self, root, paths, parent=None):
+        super(TrashMover, self).__init__(parent)
+        self.root = os.path.abspath(root)
+        self.trash_dir = os.path.join(self.root, TRASH_DIR_NAME)
+        self.paths = list(paths)
+
+    def run(self):
+        moved = []
+        errors = []
+        for path in self.paths:
+            try:
+                target = trash_path(self.trash_dir, self.root, path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(path, target)
+                moved.append(path)
+            except (OSError, shutil.Error) as e:
+                errors.append('%s: %s' % (path, e))
+        self.moved.emit(moved, errors)
@@ -97,15 +97,18 @@ def util_qt_strlistclass():
     return QStringList if have_qstring() else list
 
 
+def natural_sort_key(text):
+    """
+    Key that orders strings in natural alphanumeric order.
+    """
+    return [int(c) if c.isdigit() else c for c in re.split('([0-9]+)', text)]
+
+
 def natural_sort(list, key=lambda s:s):
     """
     Sort the list into natural alphanumeric order.
     """
-    def get_alphanum_key_func(key):
-        convert = lambda text: int(text) if text.isdigit() else text
-        return lambda s: [convert(c) for c in re.split('([0-9]+)', key(s))]
-    sort_key = get_alphanum_key_func(key)
-    list.sort(key=sort_key)
+    list.sort(key=lambda s: natural_sort_key(key(s)))
 
 
 # QT4 has a trimmed method, in QT5 this is called strip
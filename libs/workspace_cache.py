@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf8 -*-
+import os
+import sqlite3
+from collections import namedtuple
+
+WORKSPACE_CACHE_FILE = '.labelImgWorkspace.sqlite'
+SCHEMA_VERSION = 1
+# File names cannot hold a NUL, lists of them are stored joined by it
+SEP = '\0'
+
+# What was known about an image when it was last opened
+ImageInfo = namedtuple('ImageInfo', ['width', 'height', 'annotated', 'verified', 'boxes'])
+
+# A directory as listed by the scanner: mtime (None when it cannot be trusted),
+# names of its images and paths of its sub directories
+ListedDir = namedtuple('ListedDir', ['mtime', 'names', 'sub_dirs'])
+
+
+def join_names(names):
+    return SEP.join(names)
+
+
+def split_names(text):
+    return text.split(SEP) if text else []
+
+
+def file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class WorkspaceCache(object):
+    """
+        What is known about the opened directories, in an SQLite file next to
+        the settings: for each scanned directory its mtime, images and sub
+        directories, for each scanned root its sorted image list, and for each
+        opened image its size, mtime, dimensions, annotation state and box count.
+        All of it is validated against the file system before use. The cache
+        is only a shortcut: on any database error it is disabled.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = None
+        if not path:
+            return
+        try:
+            self.db = sqlite3.connect(path)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            if self.db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                self.db.executescript('''
+                    DROP TABLE IF EXISTS roots;
+                    DROP TABLE IF EXISTS dirs;
+                    DROP TABLE IF EXISTS images;
+                    CREATE TABLE roots (root TEXT PRIMARY KEY, paths TEXT NOT NULL);
+                    CREATE TABLE dirs (root TEXT NOT NULL, path TEXT NOT NULL, mtime INTEGER,
+                                       names TEXT NOT NULL, sub_dirs TEXT NOT NULL,
+                                       PRIMARY KEY (root, path));
+                    CREATE TABLE images (path TEXT PRIMARY KEY, mtime INTEGER NOT NULL,
+                                         size INTEGER NOT NULL, width INTEGER, height INTEGER,
+                                         annotated INTEGER, verified INTEGER, boxes INTEGER);
+                    PRAGMA user_version = %d;
+                ''' % SCHEMA_VERSION)
+        except sqlite3.Error as e:
+            self.disable(e)
+
+    def disable(self, error):
+        print('Workspace cache disabled: %s' % error)
+        if self.db is not None:
+            try:
+                self.db.close()
+            except sqlite3.Error:
+                pass
+        self.db = None
+
+    def load_scan(self, root):
+        """Return the listed directories under `root` and its sorted image list, or (None, None)."""
+        if self.db is None:
+            return None, None
+        try:
+            row = self.db.execute('SELECT paths FROM roots WHERE root = ?', (root,)).fetchone()
+            dirs = dict((path, ListedDir(mtime, split_names(names), split_names(sub_dirs)))
+                        for path, mtime, names, sub_dirs in self.db.execute(
+                            'SELECT path, mtime, names, sub_dirs FROM dirs WHERE root = ?', (root,)))
+        except sqlite3.Error as e:
+            self.disable(e)
+            return None, None
+        if row is None:
+            return None, None
+        return dirs, split_names(row[0])
+
+    def save_scan(self, root, dirs, paths):
+        """Record a complete scan of `root`: its listed directories and sorted image list."""
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                self.db.execute('DELETE FROM dirs WHERE root = ?', (root,))
+                self.db.executemany('INSERT INTO dirs VALUES (?, ?, ?, ?, ?)',
+                                    ((root, path, listed.mtime, join_names(listed.names),
+                                      join_names(listed.sub_dirs)) for path, listed in dirs.items()))
+                self.db.execute('INSERT OR REPLACE INTO roots VALUES (?, ?)', (root, join_names(paths)))
+        except sqlite3.Error as e:
+            self.disable(e)
+
+    def image_info(self, path):
+        """Return the ImageInfo recorded for `path`, or None if there is none or the file changed."""
+        if self.db is None:
+            return None
+        try:
+            row = self.db.execute('SELECT mtime, size, width, height, annotated, verified, boxes '
+                                  'FROM images WHERE path = ?', (path,)).fetchone()
+        except sqlite3.Error as e:
+            self.disable(e)
+            return None
+        if row is None or file_stamp(path) != tuple(row[:2]):
+            return None
+        return ImageInfo(row[2], row[3], bool(row[4]), bool(row[5]), row[6])
+
+    def save_image_info(self, path, info):
+        if self.db is None:
+            return
+        stamp = file_stamp(path)
+        if stamp is None:
+            return
+        try:
+            with self.db:
+                self.db.execute('INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                (path, stamp[0], stamp[1], info.width, info.height,
+                                 int(info.annotated), int(info.verified), info.boxes))
+        except sqlite3.Error as e:
+            self.disable(e)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
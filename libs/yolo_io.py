@@ -2,12 +2,158 @@
 # -*- coding: utf8 -*-
 import codecs
 import os
+import threading
 
 from libs.constants import DEFAULT_ENCODING
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 TXT_EXT = '.txt'
 ENCODE_METHOD = DEFAULT_ENCODING
 
+
+class ClassRegistry(object):
+    """
+        Ordered list of class names with O(1) name -> index lookup.
+        New names are appended to the wrapped list, so the caller's list (and
+        the order written to classes.txt) stays the single source of truth.
+    """
+
+    def __init__(self, class_list=None):
+        self.classes = class_list if class_list is not None else []
+        self.indices = {}
+        for name in self.classes:
+            self.indices.setdefault(name, len(self.indices))
+        if len(self.indices) != len(self.classes):
+            # Duplicates in the list: list.index() semantics, first one wins
+            self.indices = {}
+            for i, name in enumerate(self.classes):
+                self.indices.setdefault(name, i)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __contains__(self, name):
+        return name in self.indices
+
+    def index(self, name):
+        """Index of `name`, registering it at the end if it is new."""
+        index = self.indices.get(name)
+        if index is None:
+            index = self.indices[name] = len(self.classes)
+            self.classes.append(name)
+        return index
+
+
+class ClassListCache(object):
+    """
+        Parsed classes.txt files, kept per path and re-read only when the file's
+        mtime or size changes. Writes are skipped when the file already holds the
+        list and otherwise go through a temporary file renamed over the original,
+        so readers never see a half written list.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    @staticmethod
+    def stamp(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def read(self, path):
+        """Return the class names in `path`, raising OSError if it cannot be read."""
+        path = os.path.abspath(path)
+        stamp = self.stamp(path)
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry is not None and entry[0] == stamp:
+            return list(entry[1])
+        with open(path, 'r') as classes_file:
+            classes = classes_file.read().strip('\n').split('\n')
+        with self.lock:
+            self.entries[path] = (stamp, tuple(classes))
+        return classes
+
+    def write(self, path, class_list):
+        """Write `class_list` to `path` unless the file already contains it."""
+        path = os.path.abspath(path)
+        classes = tuple(class_list)
+        try:
+            if tuple(self.read(path)) == classes:
+                return False
+        except OSError:
+            pass
+        # Opened like open(path, 'w') would, so the umask applies to the new file
+        tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        try:
+            with os.fdopen(fd, 'w') as out_class_file:
+                for c in classes:
+                    out_class_file.write(c + '\n')
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        with self.lock:
+            self.entries[path] = (self.stamp(path), classes)
+        return True
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(os.path.abspath(path), None)
+
+
+class_list_cache = ClassListCache()
+
+
+def parse_yolo_text(text):
+    """
+        Parse the lines of a YOLO .txt into an (N, 5) float array of
+        class index, x center, y center, width and height.
+    """
+    lines = text.split()
+    values = np.array(lines, dtype=np.float64) if lines else np.zeros(0)
+    if values.size % 5 == 0 and values.size // 5 == text.strip().count('\n') + (1 if lines else 0):
+        return values.reshape(-1, 5)
+    # Some lines carry extra columns (e.g. a confidence), keep the first five
+    rows = [line.split()[0:5] for line in text.splitlines() if line.strip()]
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def yolo_to_pixel(boxes, img_size):
+    """
+        Convert an (N, 4) array of normalized x center, y center, width and height
+        to integer x_min, y_min, x_max, y_max pixels for an image of `img_size`
+        (height, width, ...), clipping the boxes to the image.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    half = boxes[:, 2:4] / 2
+    corners = np.concatenate((np.maximum(boxes[:, 0:2] - half, 0),
+                              np.minimum(boxes[:, 0:2] + half, 1)), axis=1)
+    scale = np.array([img_size[1], img_size[0], img_size[1], img_size[0]], dtype=np.float64)
+    return np.rint(corners * scale).astype(np.int64)
+
+
+def pixel_to_yolo(boxes, img_size):
+    """
+        Convert an (N, 4) array of x_min, y_min, x_max, y_max pixels to normalized
+        x center, y center, width and height for an image of `img_size`.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    size = np.array([img_size[1], img_size[0]], dtype=np.float64)
+    centers = (boxes[:, 0:2] + boxes[:, 2:4]) / 2 / size
+    extents = (boxes[:, 2:4] - boxes[:, 0:2]) / size
+    return np.concatenate((centers, extents), axis=1)
+
+
 class YOLOWriter:
 
     def __init__(self, folder_name, filename, img_size, database_src='Unknown', local_img_path=None):
@@ -25,7 +171,7 @@ class YOLOWriter:
         bnd_box['difficult'] = difficult
         self.box_list.append(bnd_box)
 
-    def bnd_box_to_yolo_line(self, box, class_list=[]):
+    def bnd_box_to_yolo_line(self, box, class_list=[], registry=None):
         x_min = box['xmin']
         x_max = box['xmax']
         y_min = box['ymin']
@@ -38,44 +184,43 @@ class YOLOWriter:
         h = float((y_max - y_min)) / self.img_size[0]
 
         # PR387
-        box_name = box['name']
-        if box_name not in class_list:
-            class_list.append(box_name)
-
-        class_index = class_list.index(box_name)
+        if registry is None:
+            registry = ClassRegistry(class_list)
+        class_index = registry.index(box['name'])
 
         return class_index, x_center, y_center, w, h
 
+    def to_yolo_lines(self, class_list=[]):
+        """Format all boxes as YOLO lines, registering unknown names in `class_list`."""
+        registry = ClassRegistry(class_list)
+        if np is None:
+            return ["%d %.6f %.6f %.6f %.6f\n" % self.bnd_box_to_yolo_line(box, registry=registry)
+                    for box in self.box_list]
+        indices = [registry.index(box['name']) for box in self.box_list]
+        boxes = [(box['xmin'], box['ymin'], box['xmax'], box['ymax']) for box in self.box_list]
+        rows = pixel_to_yolo(boxes, self.img_size).tolist()
+        return ["%d %.6f %.6f %.6f %.6f\n" % (index, x_center, y_center, w, h)
+                for index, (x_center, y_center, w, h) in zip(indices, rows)]
+
     def save(self, class_list=[], target_file=None):
 
         out_file = None  # Update yolo .txt
-        out_class_file = None   # Update class list .txt
 
         if target_file is None:
             out_file = open(
             self.filename + TXT_EXT, 'w', encoding=ENCODE_METHOD)
             classes_file = os.path.join(os.path.dirname(os.path.abspath(self.filename)), "classes.txt")
-            out_class_file = open(classes_file, 'w')
 
         else:
             out_file = codecs.open(target_file, 'w', encoding=ENCODE_METHOD)
             classes_file = os.path.join(os.path.dirname(os.path.abspath(target_file)), "classes.txt")
-            out_class_file = open(classes_file, 'w')
-
 
-        for box in self.box_list:
-            class_index, x_center, y_center, w, h = self.bnd_box_to_yolo_line(box, class_list)
-            # print (classIndex, x_center, y_center, w, h)
-            out_file.write("%d %.6f %.6f %.6f %.6f\n" % (class_index, x_center, y_center, w, h))
-
-        # print (classList)
-        # print (out_class_file)
-        for c in class_list:
-            out_class_file.write(c+'\n')
-
-        out_class_file.close()
+        out_file.write(''.join(self.to_yolo_lines(class_list)))
         out_file.close()
 
+        # Update class list .txt, only rewritten when the list changed
+        class_list_cache.write(classes_file, class_list)
+
 
 
 class YoloReader:
@@ -88,16 +233,15 @@ class YoloReader:
 
         if class_list_path is None:
             file_path = os.path.join(os.path.dirname(os.path.realpath(self.file_path)), "classes.txt")
-            if not os.path.exists(file_path):
+            try:
+                self.classes = class_list_cache.read(file_path)
+            except OSError:
                 file_path = default_class_list_path
+                self.classes = class_list_cache.read(file_path)
             self.class_list_path = file_path
         else:
             self.class_list_path = class_list_path
-
-        # print (file_path, self.class_list_path)
-
-        classes_file = open(self.class_list_path, 'r')
-        self.classes = classes_file.read().strip('\n').split('\n')
+            self.classes = class_list_cache.read(class_list_path)
 
         # print (self.classes)
 
@@ -136,6 +280,15 @@ class YoloReader:
         return label, x_min, y_min, x_max, y_max
 
     def parse_yolo_format(self):
+        if np is not None:
+            with open(self.file_path, 'r') as bnd_box_file:
+                values = parse_yolo_text(bnd_box_file.read())
+            corners = yolo_to_pixel(values[:, 1:5], self.img_size).tolist()
+            for class_index, (x_min, y_min, x_max, y_max) in zip(values[:, 0].astype(int).tolist(), corners):
+                # Caveat: difficult flag is discarded when saved as yolo format.
+                self.add_shape(self.classes[class_index], x_min, y_min, x_max, y_max, False)
+            return
+
         bnd_box_file = open(self.file_path, 'r')
         for bndBox in bnd_box_file:
             class_index, x_center, y_center, w, h = bndBox.strip().split(' ')[0:5]
@@ -0,0 +1,50 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.annotation_index import AnnotationIndex
+
+
+class TestAnnotationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        for name in ('a.json', 'a.xml', 'b.txt', 'c.jpg'):
+            open(os.path.join(self.tmp_dir, name), 'w').close()
+
+    def test_find_followsPriority(self):
+        index = AnnotationIndex()
+        base = os.path.join(self.tmp_dir, '%s')
+        self.assertEqual(index.find(base % 'a'), base % 'a' + '.xml')
+        self.assertEqual(index.find(base % 'b'), base % 'b' + '.txt')
+        self.assertIsNone(index.find(base % 'c'))
+        self.assertTrue(index.has_file(base % 'a.json'))
+        self.assertFalse(index.has_file(base % 'b.xml'))
+
+        # Files written by this process are recorded right away
+        open(base % 'c.json', 'w').close()
+        os.remove(base % 'a.xml')
+        index.update_file(base % 'c.json')
+        index.update_file(base % 'a.xml')
+        self.assertEqual(index.find(base % 'c'), base % 'c' + '.json')
+        self.assertEqual(index.find(base % 'a'), base % 'a' + '.json')
+
+    def test_rescan_reportsChangedNames(self):
+        index = AnnotationIndex()
+        changes = []
+        index.changed.connect(lambda folder, stems: changes.append((folder, sorted(stems))))
+        index.find(os.path.join(self.tmp_dir, 'a'))
+        os.remove(os.path.join(self.tmp_dir, 'b.txt'))
+        open(os.path.join(self.tmp_dir, 'd.xml'), 'w').close()
+        index.rescan(self.tmp_dir)
+        self.assertEqual(changes, [(self.tmp_dir, ['b', 'd'])])
+        self.assertIsNone(index.find(os.path.join(self.tmp_dir, 'b')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import Qt
+except ImportError:
+    from PyQt4.QtCore import Qt
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.dir_scanner import DirScanner, image_sort_key
+from libs.file_list_model import PathStore
+
+
+class TestDirScanner(unittest.TestCase):
+
+    def test_merge_keepsNaturalOrder(self):
+        def batch(*names):
+            paths = sorted(names, key=image_sort_key)
+            return paths, [image_sort_key(p) for p in paths]
+        paths = PathStore()
+        self.assertEqual(paths.merge(*batch('a/img2.jpg', 'b/img10.jpg')), [0, 1])
+        self.assertEqual(paths.merge(*batch('b/img11.jpg', 'b/IMG12.jpg')), [2, 3])
+        self.assertEqual(paths.merge(*batch('a/img1.jpg', 'a/img3.jpg')), [0, 2])
+        self.assertEqual(list(paths), ['a/img1.jpg', 'a/img2.jpg', 'a/img3.jpg',
+                                       'b/img10.jpg', 'b/img11.jpg', 'b/IMG12.jpg'])
+        self.assertEqual(paths.keys, [image_sort_key(p) for p in paths])
+
+    def test_scan_streamsAllImages(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        expected = []
+        for sub_dir in ('', 'b', os.path.join('b', 'c'), 'skip'):
+            os.makedirs(os.path.join(tmp_dir, sub_dir), exist_ok=True)
+            for name in ('1.JPG', '20.png', 'notes.txt'):
+                path = os.path.join(tmp_dir, sub_dir, name)
+                open(path, 'w').close()
+                if sub_dir != 'skip' and not name.endswith('.txt'):
+                    expected.append(os.path.normpath(path))
+
+        scanner = DirScanner(tmp_dir, ['.jpg', '.png'], skip_dirs=['skip'])
+        scanner.BATCH_SIZE = 1
+        batches = []
+        scanner.found.connect(lambda paths, keys: batches.append((paths, keys)), Qt.DirectConnection)
+        scanner.run()
+
+        self.assertGreater(len(batches), 1)
+        paths = PathStore()
+        for batch_paths, batch_keys in batches:
+            paths.merge(batch_paths, batch_keys)
+        self.assertEqual(list(paths), sorted(expected, key=image_sort_key))
+
+
+if __name__ == '__main__':
+    unittest.main()
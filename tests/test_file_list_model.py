@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.file_list_model import PathStore
+
+
+class TestPathStore(unittest.TestCase):
+
+    def test_index_matchesList(self):
+        paths = [os.path.join(os.sep, 'data', folder, name)
+                 for name in ('1.jpg', '2.jpg') for folder in ('a', 'b', 'c')]
+        store = PathStore(paths)
+        self.assertEqual(list(store), paths)
+        self.assertEqual(store[1:3], paths[1:3])
+        for row, path in enumerate(paths):
+            self.assertEqual(store.index(path), row)
+        self.assertNotIn(os.path.join(os.sep, 'data', 'd', '1.jpg'), store)
+        self.assertRaises(ValueError, store.index, os.path.join(os.sep, 'data', '1.jpg'))
+
+        # The map follows appends, deletions and merges
+        store.extend([os.path.join(os.sep, 'data', 'd', '1.jpg')])
+        self.assertEqual(store.index(os.path.join(os.sep, 'data', 'd', '1.jpg')), 6)
+        del store[0]
+        del paths[0]
+        for row, path in enumerate(paths):
+            self.assertEqual(store.index(path), row)
+        self.assertNotIn(os.path.join(os.sep, 'data', 'a', '1.jpg'), store)
+
+    def test_delete_keepsRowsInOrder(self):
+        paths = [os.path.join(os.sep, 'data', folder, '%d.jpg' % i)
+                 for i in range(10) for folder in ('a', 'b')]
+        store = PathStore(paths)
+        store.index(paths[0])
+        for row in (5, 0, -1, 7, 7, 3):
+            del store[row]
+            del paths[row]
+            self.assertEqual(list(store), paths)
+            self.assertEqual(store[2:6], paths[2:6])
+            for row, path in enumerate(paths):
+                self.assertEqual(store[row], path)
+                self.assertEqual(store.index(path), row)
+        # Appends after deletions, then enough deletions to compact the store
+        store.extend([os.path.join(os.sep, 'data', 'c', '1.jpg')])
+        paths.append(os.path.join(os.sep, 'data', 'c', '1.jpg'))
+        self.assertEqual(store.index(paths[-1]), len(paths) - 1)
+        while len(paths) > 2:
+            del store[1]
+            del paths[1]
+        self.assertLessEqual(store.removed * 2, len(store.names))
+        self.assertEqual(list(store), paths)
+        self.assertEqual([store.index(path) for path in paths], [0, 1])
+        self.assertRaises(IndexError, store.__getitem__, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
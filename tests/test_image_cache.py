@@ -0,0 +1,45 @@
+import os
+import sys
+import unittest
+
+try:
+    from PyQt5.QtGui import QImage
+except ImportError:
+    from PyQt4.QtGui import QImage
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.image_cache import ImageCache, file_mtime, image_bytes
+
+
+class TestImageCache(unittest.TestCase):
+
+    def test_evictsLeastRecentlyUsed_withinBudget(self):
+        path = os.path.join(dir_name, 'test.512.512.bmp')
+        image = QImage(100, 100, QImage.Format_RGB32)
+        self.assertEqual(image_bytes(image), 100 * 100 * 4)
+
+        cache = ImageCache(max_bytes=2 * image_bytes(image))
+        mtime = file_mtime(path)
+        cache.put(path, mtime, image)
+        cache.put(path + '.a', mtime, image)
+        # Only the first path exists on disk, the others are never served
+        self.assertIsNotNone(cache.get(path))
+        self.assertIsNone(cache.get(path + '.a'))
+
+        cache.put('b', mtime, image)
+        cache.put('c', mtime, image)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        self.assertNotIn(path, cache)
+
+    def test_staleMtime_isNotServed(self):
+        path = os.path.join(dir_name, 'test.512.512.bmp')
+        cache = ImageCache(max_bytes=1 << 20)
+        cache.put(path, file_mtime(path) - 1, QImage(10, 10, QImage.Format_RGB32))
+        self.assertIsNone(cache.get(path))
+        self.assertEqual(cache.total_bytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtGui import QImage, QColor
+except ImportError:
+    from PyQt4.QtGui import QImage, QColor
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.image_header import read_image_shape
+
+
+def decoded_shape(image_path):
+    image = QImage()
+    image.load(image_path)
+    return [image.height(), image.width(), 1 if image.isGrayscale() else 3]
+
+
+class TestImageHeader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_sampleImages_matchDecodedShape(self):
+        for name in ('test.512.512.bmp', u'臉書.jpg'):
+            path = os.path.join(dir_name, name)
+            self.assertEqual(read_image_shape(path), decoded_shape(path), name)
+
+    def test_savedFormats_matchDecodedShape(self):
+        for ext in ('png', 'jpg', 'bmp', 'tiff', 'webp'):
+            for image_format in (QImage.Format_RGB32, QImage.Format_Grayscale8):
+                if ext == 'webp' and image_format == QImage.Format_Grayscale8:
+                    # WebP has no grayscale mode, only the decoded pixels tell
+                    continue
+                image = QImage(37, 23, image_format)
+                image.fill(QColor(10, 20, 30))
+                path = os.path.join(self.tmp_dir, '%d.%s' % (image_format, ext))
+                if not image.save(path):
+                    continue
+                self.assertEqual(read_image_shape(path), decoded_shape(path), path)
+
+    def test_unknownFormat_returnsNone(self):
+        path = os.path.join(self.tmp_dir, 'not_an_image.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'plain text')
+        self.assertIsNone(read_image_shape(path))
+        self.assertIsNone(read_image_shape(os.path.join(self.tmp_dir, 'missing.png')))
+
+
+if __name__ == '__main__':
+    unittest.main()
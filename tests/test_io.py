@@ -28,6 +28,61 @@ class TestPascalVocRW(unittest.TestCase):
         self.assertEqual(face[0], 'face')
         self.assertEqual(face[1], [(113, 40), (450, 40), (450, 403), (113, 403)])
 
+    def test_to_xml_matchesPrettify(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        from pascal_voc_io import PascalVocWriter
+
+        writer = PascalVocWriter('tests', 'test', (512, 512, 1), local_img_path='tests/test.512.512.bmp')
+        writer.verified = True
+        writer.add_bnd_box(60, 40, 430, 504, 'person', 1)
+        writer.add_bnd_box(113, 40, 450, 403, u'R&D <face>', 0)
+        root = writer.gen_xml()
+        writer.append_objects(root)
+        self.assertEqual(writer.to_xml(), writer.prettify(root).decode('utf8'))
+
+        # Double spaces in a label are no longer turned into tabs
+        writer.add_bnd_box(1, 1, 2, 2, 'traffic  light', 0)
+        self.assertIn('<name>traffic  light</name>', writer.to_xml())
+
+    def test_read_voc_directory_matchesReader(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import shutil
+        import tempfile
+        from pascal_voc_io import PascalVocWriter, PascalVocReader, read_voc_directory
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        for i, labels in enumerate((['person', 'face'], [], ['face', 'dog', 'face'])):
+            writer = PascalVocWriter('tests', 'img%d' % i, (480, 640, 3))
+            writer.verified = i == 2
+            for j, label in enumerate(labels):
+                writer.add_bnd_box(10 * j, 20, 30 + j, 40 + i, label, j % 2)
+            writer.save(os.path.join(tmp_dir, 'img%d.xml' % i))
+        with open(os.path.join(tmp_dir, 'broken.xml'), 'w') as f:
+            f.write('<annotation>')
+
+        for workers in (1, 2):
+            columns = read_voc_directory(tmp_dir, workers=workers)
+            self.assertEqual([os.path.basename(p) for p in columns.file_paths],
+                             ['broken.xml', 'img0.xml', 'img1.xml', 'img2.xml'])
+            self.assertEqual(columns.offsets.tolist(), [0, 0, 2, 2, 5])
+            self.assertEqual(columns.verified.tolist(), [False, False, False, True])
+            self.assertEqual(columns.image_sizes.tolist(), [[0, 0, 0]] + [[480, 640, 3]] * 3)
+            self.assertEqual(columns.label_names, ['person', 'face', 'dog'])
+            self.assertEqual(str(columns.boxes.dtype), 'int32')
+            for i, file_path in enumerate(columns.file_paths[1:], 1):
+                shapes = PascalVocReader(file_path).get_shapes()
+                start, end = columns.offsets[i], columns.offsets[i + 1]
+                self.assertEqual([s[0] for s in shapes],
+                                 [columns.label_names[c] for c in columns.labels[start:end]])
+                self.assertEqual([s[1][0] + s[1][2] for s in shapes],
+                                 [tuple(b) for b in columns.boxes[start:end].tolist()])
+                self.assertEqual([s[4] for s in shapes], columns.difficult[start:end].tolist())
+
 
 class TestCreateMLRW(unittest.TestCase):
 
@@ -96,6 +151,155 @@ class TestCreateMLRW(unittest.TestCase):
         self.assertEqual(250, y_min, 'ymin is wrong')
         self.assertEqual(365, y_max, 'ymax is wrong')
 
+    def test_c_journal_compaction(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import shutil
+        import tempfile
+        from create_ml_io import CreateMLWriter, CreateMLReader, CreateMLStore, JOURNAL_EXT
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.addCleanup(setattr, CreateMLStore, 'SYNC_WRITE_BYTES', CreateMLStore.SYNC_WRITE_BYTES)
+        self.addCleanup(setattr, CreateMLStore, 'COMPACT_EVERY', CreateMLStore.COMPACT_EVERY)
+        CreateMLStore.SYNC_WRITE_BYTES = 0
+        CreateMLStore.COMPACT_EVERY = 1000
+        output_file = os.path.join(tmp_dir, 'dataset.json')
+
+        def save(image_name, label):
+            shapes = [{'label': label, 'points': ((1, 2), (11, 2), (11, 22), (1, 22))}]
+            CreateMLWriter('tests', image_name, (512, 512, 1), shapes, output_file).write()
+
+        for i in range(3):
+            save('%d.jpg' % i, 'dog')
+        save('1.jpg', 'cat')
+        self.assertTrue(os.path.isfile(output_file + JOURNAL_EXT))
+
+        # Readers see journaled updates, with and without the store being open
+        self.assertEqual(CreateMLReader(output_file, '1.jpg').get_shapes()[0][0], 'cat')
+        CreateMLStore.close_all()
+        self.assertFalse(os.path.isfile(output_file + JOURNAL_EXT))
+        with open(output_file) as f:
+            images = json.load(f)
+        self.assertEqual([image['image'] for image in images], ['0.jpg', '1.jpg', '2.jpg'])
+        self.assertEqual(images[1]['annotations'][0]['label'], 'cat')
+
+        save('3.jpg', 'bird')
+        CreateMLStore.stores.clear()
+        self.assertEqual(CreateMLReader(output_file, '3.jpg').get_shapes()[0][0], 'bird')
+        self.assertEqual(CreateMLReader(output_file, '1.jpg').get_shapes()[0][0], 'cat')
+
+    def test_d_cached_reader_perImageVerified(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import json
+        import shutil
+        import tempfile
+        from create_ml_io import CreateMLReader, create_ml_entry_cache
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        output_file = os.path.join(tmp_dir, 'dataset.json')
+        coordinates = {'x': 6, 'y': 12, 'width': 10, 'height': 20}
+        images = [{'image': '%d.jpg' % i, 'verified': i == 1,
+                   'annotations': [{'label': str(i), 'coordinates': coordinates}]} for i in range(3)]
+        with open(output_file, 'w') as f:
+            json.dump(images, f)
+
+        self.assertFalse(CreateMLReader(output_file, 'a/0.jpg').verified)
+        self.assertTrue(CreateMLReader(output_file, 'a/1.jpg').verified)
+        entries = create_ml_entry_cache.get(output_file)
+        self.assertIs(create_ml_entry_cache.get(output_file), entries)
+        self.assertEqual(CreateMLReader(output_file, '2.jpg').get_shapes(),
+                         [('2', [(1, 2), (11, 2), (11, 22), (1, 22)], None, None, True)])
+        self.assertEqual(CreateMLReader(output_file, 'missing.jpg').get_shapes(), [])
+
+        images[2]['annotations'][0]['label'] = 'changed'
+        with open(output_file, 'w') as f:
+            json.dump(images, f, indent=1)
+        self.assertEqual(CreateMLReader(output_file, '2.jpg').get_shapes()[0][0], 'changed')
+
+
+class TestYoloRW(unittest.TestCase):
+
+    def test_classRegistry_appendsToList(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        from yolo_io import ClassRegistry
+
+        class_list = ['dog', 'cat', 'dog']
+        registry = ClassRegistry(class_list)
+        self.assertEqual(registry.index('dog'), 0)
+        self.assertEqual(registry.index('cat'), 1)
+        self.assertEqual(registry.index('bird'), 3)
+        self.assertEqual(class_list, ['dog', 'cat', 'dog', 'bird'])
+
+    def test_write_read_roundTrip(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import shutil
+        import tempfile
+        from yolo_io import YOLOWriter, YoloReader, parse_yolo_text
+        try:
+            from PyQt5.QtGui import QImage
+        except ImportError:
+            from PyQt4.QtGui import QImage
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        target_file = os.path.join(tmp_dir, 'test.txt')
+        class_list = ['face']
+        writer = YOLOWriter('tests', 'test', (300, 400, 3))
+        writer.add_bnd_box(60, 40, 330, 290, 'person', 0)
+        writer.add_bnd_box(113, 40, 250, 203, 'face', 0)
+        writer.save(class_list, target_file)
+        self.assertEqual(class_list, ['face', 'person'])
+
+        with open(target_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], '1 0.487500 0.550000 0.675000 0.833333')
+        values = parse_yolo_text('\n'.join(lines) + '\n')
+        self.assertEqual(values.shape, (2, 5))
+        self.assertEqual(parse_yolo_text('0 0.5 0.5 0.1 0.1 0.9\n\n1 0.2 0.2 0.1 0.1 0.8\n').shape, (2, 5))
+
+        reader = YoloReader(target_file, QImage(400, 300, QImage.Format_RGB32), None)
+        shapes = reader.get_shapes()
+        self.assertEqual(shapes[0][0], 'person')
+        self.assertEqual(shapes[0][1], [(60, 40), (330, 40), (330, 290), (60, 290)])
+        self.assertEqual(shapes[1][0], 'face')
+        self.assertEqual(shapes[1][1], [(113, 40), (250, 40), (250, 203), (113, 203)])
+
+    def test_classListCache_writesOnlyOnChange(self):
+        dir_name = os.path.abspath(os.path.dirname(__file__))
+        libs_path = os.path.join(dir_name, '..', 'libs')
+        sys.path.insert(0, libs_path)
+        import shutil
+        import tempfile
+        from yolo_io import ClassListCache
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        classes_file = os.path.join(tmp_dir, 'classes.txt')
+        cache = ClassListCache()
+        self.assertRaises(OSError, cache.read, classes_file)
+        self.assertTrue(cache.write(classes_file, ['dog', 'cat']))
+        self.assertFalse(cache.write(classes_file, ['dog', 'cat']))
+        self.assertEqual(cache.read(classes_file), ['dog', 'cat'])
+        self.assertEqual(os.listdir(tmp_dir), ['classes.txt'])
+
+        # Changes made behind the cache's back are picked up
+        with open(classes_file, 'w') as f:
+            f.write('bird\ndog\ncat\nfish\n')
+        self.assertEqual(cache.read(classes_file), ['bird', 'dog', 'cat', 'fish'])
+        self.assertTrue(cache.write(classes_file, ['dog', 'cat']))
+        with open(classes_file) as f:
+            self.assertEqual(f.read(), 'dog\ncat\n')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+import unittest
+
+try:
+    from PyQt5.QtCore import Qt
+except ImportError:
+    from PyQt4.QtCore import Qt
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.label_saver import LabelSaver
+
+
+class TestLabelSaver(unittest.TestCase):
+
+    def setUp(self):
+        self.saver = LabelSaver()
+        self.addCleanup(self.saver.shutdown)
+        # Without an event loop, listen on the worker thread itself
+        self.finished = []
+        self.saver.finished.connect(lambda *args: self.finished.append(args), Qt.DirectConnection)
+
+    def test_queuedWrites_areCoalescedInOrder(self):
+        written = []
+        gate = threading.Event()
+        self.saver.submit('a.jpg', 'a.xml', gate.wait)
+        for i in range(3):
+            self.saver.submit('b.jpg', 'b.xml', lambda i=i: written.append(('b', i)))
+        self.saver.submit('c.jpg', 'c.xml', lambda: written.append(('c', 0)))
+        self.saver.submit('b.jpg', 'b.xml', lambda: written.append(('b', 3)))
+        gate.set()
+
+        self.assertTrue(self.saver.flush('b.jpg'))
+        self.assertEqual(written[0], ('b', 3))
+        self.assertTrue(self.saver.flush())
+        self.assertEqual(written, [('b', 3), ('c', 0)])
+        self.assertEqual([args[0] for args in self.finished], ['a.jpg', 'b.jpg', 'c.jpg'])
+
+        # Delivering the results on the owner thread settles the image
+        for args in self.finished:
+            self.saver.on_finished(*args)
+        self.assertFalse(self.saver.flush('b.jpg'))
+
+    def test_errors_areReported(self):
+        def fail():
+            raise IOError('disk full')
+        failed = []
+        self.saver.failed.connect(lambda *args: failed.append(args))
+        self.saver.submit('a.jpg', 'a.xml', fail)
+        self.saver.flush()
+        self.assertEqual(self.finished, [('a.jpg', 'a.xml', 'disk full')])
+        self.saver.on_finished(*self.finished[0])
+        self.assertEqual(failed, [('a.jpg', 'a.xml', 'disk full')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,13 @@
 
 from unittest import TestCase
 
+try:
+    from PyQt5.QtCore import QRectF
+    from PyQt5.QtGui import QColor, QPixmap
+except ImportError:
+    from PyQt4.QtCore import QRectF
+    from PyQt4.QtGui import QColor, QPixmap
+
 from labelImg import get_main_app
 
 
@@ -13,8 +20,49 @@ class TestMainWindow(TestCase):
         self.app, self.win = get_main_app()
 
     def tearDown(self):
+        # Do not ask to save what the tests changed
+        self.win.set_clean()
         self.win.close()
         self.app.quit()
 
     def test_noop(self):
         pass
+
+    def test_canvas_overlayCachedUntilChanged(self):
+        canvas = self.win.canvas
+        pixmap = QPixmap(8, 8)
+        canvas.load_pixmap(pixmap)
+        self.assertIs(canvas.overlaid_pixmap(), canvas.pixmap)
+        canvas.overlay_color = QColor(200, 200, 200)
+        overlaid = canvas.overlaid_pixmap()
+        self.assertIsNot(overlaid, canvas.pixmap)
+        self.assertIs(canvas.overlaid_pixmap(), overlaid)
+        canvas.overlay_color = QColor(100, 100, 100)
+        self.assertIsNot(canvas.overlaid_pixmap(), overlaid)
+        overlaid = canvas.overlaid_pixmap()
+        canvas.load_pixmap(QPixmap(8, 8))
+        self.assertIsNot(canvas.overlaid_pixmap(), overlaid)
+
+    def test_canvas_dirtyRectsCoverImageArea(self):
+        canvas = self.win.canvas
+        canvas.load_pixmap(QPixmap(400, 300))
+        canvas.resize(1000, 1000)
+        for scale in (0.3, 1.0, 2.5):
+            canvas.scale = scale
+            area = QRectF(10.5, 20.25, 30, 7.5)
+            shown = canvas.image_rect(canvas.widget_rect(area))
+            self.assertTrue(shown.contains(area))
+
+    def test_loadLabels_countsLabelsOnce(self):
+        self.win.canvas.load_pixmap(QPixmap(100, 100))
+        box = [(0, 0), (10, 0), (10, 10), (0, 10)]
+        self.win.load_labels([('dog', box, None, None, False), ('cat', box, None, None, False),
+                              ('dog', box, None, None, False)])
+        self.assertEqual(self.win.label_counts, {'dog': 2, 'cat': 1})
+        self.assertEqual(self.win.combo_box.items, ['', 'cat', 'dog'])
+
+        self.win.remove_label(self.win.canvas.shapes[1])
+        self.assertEqual(self.win.combo_box.items, ['', 'dog'])
+        item = self.win.shapes_to_items[self.win.canvas.shapes[0]]
+        item.setText('bird')
+        self.assertEqual(self.win.label_counts, {'dog': 1, 'bird': 1})
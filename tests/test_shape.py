@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+
+try:
+    from PyQt5.QtCore import QPointF, QRectF
+except ImportError:
+    from PyQt4.QtCore import QPointF, QRectF
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.shape import Shape
+
+
+class TestShape(unittest.TestCase):
+
+    def test_geometry_followsPoints(self):
+        shape = Shape()
+        shape.add_point(QPointF(0, 0))
+        shape.add_point(QPointF(10, 0))
+        self.assertEqual(shape.bounding_rect(), QRectF(0, 0, 10, 0))
+        shape.add_point(QPointF(10, 20))
+        shape.add_point(QPointF(0, 20))
+        self.assertEqual(shape.bounding_rect(), QRectF(0, 0, 10, 20))
+        self.assertTrue(shape.contains_point(QPointF(5, 5)))
+        self.assertIs(shape.path(), shape.path())
+
+        shape.move_by(QPointF(100, 0))
+        self.assertEqual(shape.bounding_rect(), QRectF(100, 0, 10, 20))
+        self.assertFalse(shape.contains_point(QPointF(5, 5)))
+        shape.move_vertex_by(2, QPointF(5, 5))
+        self.assertEqual(shape.bounding_rect(), QRectF(100, 0, 15, 25))
+        shape[0] = QPointF(90, -10)
+        self.assertEqual(shape.bounding_rect(), QRectF(90, -10, 25, 35))
+        shape.points = [QPointF(1, 1), QPointF(2, 2)]
+        self.assertEqual(shape.bounding_rect(), QRectF(1, 1, 1, 1))
+
+        copy = shape.copy()
+        copy.move_by(QPointF(1, 1))
+        self.assertEqual(shape.bounding_rect(), QRectF(1, 1, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
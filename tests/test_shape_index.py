@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+import unittest
+
+try:
+    from PyQt5.QtCore import QPointF
+except ImportError:
+    from PyQt4.QtCore import QPointF
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.shape import Shape
+from libs.shape_index import ShapeGrid
+
+
+def box(x, y, w, h):
+    shape = Shape()
+    for point in ((x, y), (x + w, y), (x + w, y + h), (x, y + h)):
+        shape.add_point(QPointF(*point))
+    shape.close()
+    return shape
+
+
+class TestShapeGrid(unittest.TestCase):
+
+    def test_candidates_coverHits(self):
+        rng = random.Random(0)
+        shapes = [box(rng.uniform(0, 900), rng.uniform(0, 900), rng.uniform(1, 200), rng.uniform(1, 200))
+                  for _ in range(300)]
+        grid = ShapeGrid(cell_size=50, margin=10)
+        grid.reset(shapes[:200])
+        for shape in shapes[200:]:
+            grid.add(shape)
+        for shape in shapes[::3]:
+            shape.move_by(QPointF(rng.uniform(-100, 100), rng.uniform(-100, 100)))
+            grid.update(shape)
+        for shape in shapes[1::7]:
+            grid.remove(shape)
+        indexed = [shape for shape in shapes if shape in grid]
+
+        for _ in range(200):
+            point = QPointF(rng.uniform(-50, 1150), rng.uniform(-50, 1150))
+            candidates = grid.candidates(point)
+            self.assertEqual(candidates, [shape for shape in indexed if shape in candidates])
+            for shape in indexed:
+                if shape.contains_point(point) or shape.nearest_vertex(point, 10) is not None:
+                    self.assertIn(shape, candidates)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import Qt
+except ImportError:
+    from PyQt4.QtCore import Qt
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.trash_mover import TrashMover, TRASH_DIR_NAME
+
+
+class TestTrashMover(unittest.TestCase):
+
+    def test_move_keepsRelativePaths(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        os.makedirs(os.path.join(tmp_dir, 'sub', TRASH_DIR_NAME))
+        paths = [os.path.join(tmp_dir, 'a.jpg'), os.path.join(tmp_dir, 'sub', 'a.jpg')]
+        for path in paths:
+            open(path, 'w').close()
+        # A file already in the trash is not overwritten
+        os.makedirs(os.path.join(tmp_dir, TRASH_DIR_NAME))
+        open(os.path.join(tmp_dir, TRASH_DIR_NAME, 'a.jpg'), 'w').close()
+
+        mover = TrashMover(tmp_dir, paths + [os.path.join(tmp_dir, 'missing.jpg')])
+        results = []
+        mover.moved.connect(lambda moved, errors: results.append((moved, errors)), Qt.DirectConnection)
+        mover.run()
+
+        self.assertEqual(len(results), 1)
+        moved, errors = results[0]
+        self.assertEqual(moved, paths)
+        self.assertEqual(len(errors), 1)
+        trash_dir = os.path.join(tmp_dir, TRASH_DIR_NAME)
+        self.assertTrue(os.path.isfile(os.path.join(trash_dir, 'a (1).jpg')))
+        self.assertTrue(os.path.isfile(os.path.join(trash_dir, 'sub', 'a.jpg')))
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from PyQt5.QtCore import Qt
+except ImportError:
+    from PyQt4.QtCore import Qt
+
+dir_name = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(dir_name, '..'))
+from libs.dir_scanner import DirScanner
+from libs.workspace_cache import WorkspaceCache, ImageInfo
+
+
+class TestWorkspaceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.image_dir = os.path.join(self.tmp_dir, 'images')
+        os.makedirs(os.path.join(self.image_dir, 'sub'))
+        for name in ('1.jpg', os.path.join('sub', '2.jpg')):
+            open(os.path.join(self.image_dir, name), 'w').close()
+        self.age(self.image_dir, os.path.join(self.image_dir, 'sub'))
+
+    @staticmethod
+    def age(*paths):
+        # Directories changed within the scanner's mtime slack are listed again
+        for path in paths:
+            os.utime(path, (1000000000, 1000000000))
+
+    def scan(self, cache):
+        listed_dirs, listed_paths = cache.load_scan(self.image_dir)
+        scanner = DirScanner(self.image_dir, ['.jpg'], listed_dirs=listed_dirs, listed_paths=listed_paths)
+        found, restored = [], []
+        scanner.found.connect(lambda paths, keys: found.extend(paths), Qt.DirectConnection)
+        scanner.restored.connect(restored.extend, Qt.DirectConnection)
+        scanner.run()
+        self.assertTrue(scanner.complete)
+        cache.save_scan(self.image_dir, scanner.listed, sorted(found + restored))
+        return sorted(found), restored
+
+    def test_scan_reusesUnchangedDirectories(self):
+        cache = WorkspaceCache(os.path.join(self.tmp_dir, 'workspace.sqlite'))
+        self.addCleanup(cache.close)
+        expected = [os.path.join(self.image_dir, '1.jpg'), os.path.join(self.image_dir, 'sub', '2.jpg')]
+        self.assertEqual(self.scan(cache), (expected, []))
+        self.assertEqual(self.scan(cache), ([], expected))
+
+        open(os.path.join(self.image_dir, 'sub', '3.jpg'), 'w').close()
+        expected.append(os.path.join(self.image_dir, 'sub', '3.jpg'))
+        self.assertEqual(self.scan(cache), (expected, []))
+
+    def test_imageInfo_followsFile(self):
+        cache = WorkspaceCache(os.path.join(self.tmp_dir, 'workspace.sqlite'))
+        self.addCleanup(cache.close)
+        path = os.path.join(self.image_dir, '1.jpg')
+        info = ImageInfo(640, 480, True, False, 3)
+        cache.save_image_info(path, info)
+        self.assertEqual(cache.image_info(path), info)
+        with open(path, 'w') as f:
+            f.write('changed')
+        self.assertIsNone(cache.image_info(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
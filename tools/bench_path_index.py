@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time path -> row lookups in the image list (PathStore) against list.index,
+for growing numbers of images. PathStore lookups should stay flat.
+
+Usage: python tools/bench_path_index.py [-n LOOKUPS] [--max-images N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from libs.file_list_model import PathStore
+
+
+def make_paths(count):
+    return [os.path.join(os.sep, 'data', 'capture_%02d' % (i % 50), 'frame_%07d.jpg' % i) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-n', '--lookups', type=int, default=200)
+    parser.add_argument('--max-images', type=int, default=10 ** 6)
+    args = parser.parse_args()
+
+    count = 1000
+    print('%10s %18s %18s %14s' % ('images', 'PathStore us/op', 'list.index us/op', 'map build ms'))
+    while count <= args.max_images:
+        paths = make_paths(count)
+        store = PathStore(paths)
+        store.rows = None
+        build = timeit.timeit(lambda: store.index(paths[0]), number=1)
+        probes = [random.choice(paths) for _ in range(args.lookups)]
+        indexed = timeit.timeit(lambda: [store.index(p) for p in probes], number=1)
+        # list.index is linear, probe fewer times on large lists
+        linear_probes = probes[:max(1, args.lookups * 1000 // count)]
+        linear = timeit.timeit(lambda: [paths.index(p) for p in linear_probes], number=1)
+        print('%10d %18.2f %18.2f %14.1f' % (count, indexed / len(probes) * 1e6,
+                                             linear / len(linear_probes) * 1e6, build * 1e3))
+        count *= 10
+
+
+if __name__ == '__main__':
+    main()
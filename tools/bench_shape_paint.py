@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Time painting and hit-testing canvas shapes offscreen, with the cached shape
+geometry against geometry rebuilt for every frame as before.
+
+Usage: python tools/bench_shape_paint.py [-s SHAPES] [-f FRAMES]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+try:
+    from PyQt5.QtCore import QPointF
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtWidgets import QApplication
+except ImportError:
+    from PyQt4.QtCore import QPointF
+    from PyQt4.QtGui import QApplication, QImage, QPainter
+
+from libs.shape import Shape
+
+
+def make_shapes(count, width, height):
+    rng = random.Random(0)
+    shapes = []
+    for _ in range(count):
+        x, y = rng.uniform(0, width - 100), rng.uniform(0, height - 100)
+        w, h = rng.uniform(10, 100), rng.uniform(10, 100)
+        shape = Shape(label='object', paint_label=True)
+        for point in ((x, y), (x + w, y), (x + w, y + h), (x, y + h)):
+            shape.add_point(QPointF(*point))
+        shape.close()
+        shapes.append(shape)
+    return shapes
+
+
+def paint(image, shapes, invalidate):
+    painter = QPainter(image)
+    for shape in shapes:
+        if invalidate:
+            shape.invalidate()
+        shape.paint(painter)
+    painter.end()
+
+
+def hit_test(shapes, points, invalidate):
+    for point in points:
+        for shape in shapes:
+            if invalidate:
+                shape.invalidate()
+            shape.contains_point(point)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-s', '--shapes', type=int, default=5000)
+    parser.add_argument('-f', '--frames', type=int, default=10)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    image = QImage(4000, 3000, QImage.Format_ARGB32_Premultiplied)
+    shapes = make_shapes(args.shapes, image.width(), image.height())
+    points = [QPointF(random.uniform(0, 4000), random.uniform(0, 3000)) for _ in range(10)]
+
+    print('%10s %14s %14s' % ('', 'rebuilt ms', 'cached ms'))
+    for name, run, count in (('paint', lambda invalidate: paint(image, shapes, invalidate), args.frames),
+                             ('hit test', lambda invalidate: hit_test(shapes, points, invalidate), 1)):
+        run(False)
+        rebuilt = timeit.timeit(lambda: run(True), number=count) / count
+        cached = timeit.timeit(lambda: run(False), number=count) / count
+        print('%10s %14.1f %14.1f' % (name, rebuilt * 1e3, cached * 1e3))
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compare the single-pass PascalVocWriter.to_xml serializer with the
+ElementTree -> lxml prettify path it replaced.
+
+Usage: python tools/bench_voc_writer.py [-n FILES] [-b BOXES]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from libs.pascal_voc_io import PascalVocWriter
+
+
+def make_writer(boxes):
+    writer = PascalVocWriter('images', 'frame_000001.jpg', (1080, 1920, 3),
+                             local_img_path='/data/images/frame_000001.jpg')
+    for i in range(boxes):
+        writer.add_bnd_box(10 + i, 20 + i, 200 + i, 300 + i, 'person', i % 2)
+    return writer
+
+
+def prettify_path(writer):
+    root = writer.gen_xml()
+    writer.append_objects(root)
+    return writer.prettify(root)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--files', type=int, default=2000, help='annotation files to serialize')
+    parser.add_argument('-b', '--boxes', type=int, default=20, help='boxes per file')
+    args = parser.parse_args()
+
+    writer = make_writer(args.boxes)
+    assert prettify_path(writer).decode('utf8') == writer.to_xml()
+
+    old = timeit.timeit(lambda: prettify_path(writer), number=args.files)
+    new = timeit.timeit(writer.to_xml, number=args.files)
+    print('%d files x %d boxes' % (args.files, args.boxes))
+    print('prettify (ElementTree -> lxml): %8.1f ms' % (old * 1000))
+    print('to_xml (single pass):           %8.1f ms' % (new * 1000))
+    print('speedup:                        %8.1fx' % (old / new))
+
+
+if __name__ == '__main__':
+    main()